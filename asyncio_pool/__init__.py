@@ -1,7 +1,13 @@
 import sys
 
 from .results import getres
+from .ratelimit import RateLimit
+from .adaptive import AimdController
+from .metrics import Metrics
+from .retry import Retry
+from .group import Group
 from .base_pool import BaseAioPool
+from .worker_pool import BaseWorkerPool
 
 
 if sys.version_info < (3, 6):  # this means 3.5  # TODO test 3.4?
@@ -10,7 +16,15 @@ if sys.version_info < (3, 6):  # this means 3.5  # TODO test 3.4?
 
     class AioPool(MxAsyncIterPool, BaseAioPool): pass
 
+    class AioWorkerPool(MxAsyncIterPool, BaseWorkerPool): pass
+
 else:
     from .mx_asyncgen import MxAsyncGenPool, iterwait
 
     class AioPool(MxAsyncGenPool, BaseAioPool): pass
+
+    class AioWorkerPool(MxAsyncGenPool, BaseWorkerPool): pass
+
+
+from .pipeline import Pipeline
+from .sharded import ShardedPool
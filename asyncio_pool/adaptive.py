@@ -0,0 +1,84 @@
+'''Controllers, adjusting pool size to observed latency and errors'''
+
+import time
+import asyncio as aio
+
+
+class AimdController(object):
+
+    def __init__(self, min_size=1, max_size=1024, *, interval=1.0,
+            min_samples=10, increase=1, decrease=0.75, max_error_rate=0.1,
+            latency_target=None, tolerance=2.0):
+        '''Additive increase / multiplicative decrease of pool size. Pass it
+        to pool as `controller`, and pool will report latency and outcome of
+        every finished coroutine (callbacks are not counted).
+
+        Every `interval` seconds (if at least `min_samples` coroutines
+        finished) controller compares window stats with limits: if share of
+        crashed coroutines is bigger than `max_error_rate`, or mean latency
+        is higher than `latency_target` -- pool is shrinked `decrease` times,
+        otherwise, if there are coroutines waiting for pool space -- pool grows
+        by `increase`. Size is always kept between `min_size` and `max_size`.
+
+        If `latency_target` is None, it's `tolerance` times the baseline --
+        lowest mean latency seen, slowly drifting towards current mean, so
+        latency growth caused by overloaded backend is detected (gradient
+        approach) without knowing it's capacity beforehand.
+
+        Cancelled coroutines are not counted as errors. One controller per
+        pool.
+        '''
+        self.min_size = min_size
+        self.max_size = max_size
+        self.interval = interval
+        self.min_samples = min_samples
+        self.increase = increase
+        self.decrease = decrease
+        self.max_error_rate = max_error_rate
+        self.latency_target = latency_target
+        self.tolerance = tolerance
+
+        self.baseline = None
+        self._reset(time.monotonic())
+
+    def _reset(self, now):
+        self._window_start = now
+        self._n = self._errors = 0
+        self._latency = 0.0
+
+    def observe(self, pool, latency, exc=None):
+        '''Records `latency` (seconds) of finished coroutine and it's
+        exception if any, resizes `pool` when window is over.'''
+
+        self._n += 1
+        self._latency += latency
+        if exc is not None and not isinstance(exc, aio.CancelledError):
+            self._errors += 1
+
+        now = time.monotonic()
+        if now - self._window_start < self.interval or \
+                self._n < self.min_samples:
+            return
+
+        size = self.decide(pool, self._latency / self._n,
+                           self._errors / self._n)
+        self._reset(now)
+        if size != pool.size:
+            pool.resize(size)
+
+    def decide(self, pool, latency, error_rate):
+        '''Returns new size for `pool` given window's mean `latency` and
+        `error_rate`.'''
+
+        if self.baseline is None or latency < self.baseline:
+            self.baseline = latency
+        else:
+            self.baseline += (latency - self.baseline) * 0.05
+        target = self.latency_target or self.baseline * self.tolerance
+
+        size = pool.size
+        if error_rate > self.max_error_rate or latency > target:
+            size = int(size * self.decrease)
+        elif len(pool) > pool.n_active:  # someone is waiting for space
+            size += self.increase
+        return max(self.min_size, min(self.max_size, size))
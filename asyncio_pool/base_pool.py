@@ -1,13 +1,32 @@
 '''Pool of asyncio coroutines with familiar interface, python3.5+ friendly'''
 
+import time
+import heapq
+import inspect
 import traceback
 import asyncio as aio
+from functools import partial
+from itertools import islice, count
+from collections import deque
+from concurrent.futures import Executor, ThreadPoolExecutor, \
+    ProcessPoolExecutor
 from .results import getres
+from .completion import CompletionQueue
+from .group import _current_group, _enter_group
+
+
+_NOLIMIT = object()  # key of coroutines, applying rate limit themselves
+_OVERFLOW = ('block', 'raise', 'drop_new', 'drop_old', 'priority')
+_NOINITIAL = object()  # `reduce` without initial value
+_EAGER = hasattr(aio, 'eager_task_factory')  # python3.12+
 
 
 class BaseAioPool(object):
 
-    def __init__(self, size=1024, *, loop=None):
+    def __init__(self, size=1024, *, loop=None, rate_limit=None,
+            controller=None, metrics=None, inline_callbacks=False,
+            key_limit=None, fair=False, max_waiting=None, overflow='block',
+            eager=False):
         '''Pool of asyncio coroutines with familiar interface.
 
         Pool makes sure _no more_ and _no less_ (if possible) than `size`
@@ -22,22 +41,114 @@ class BaseAioPool(object):
         The main idea behind spwaning methods is -- they return newly created
         futures, not "native" ones, returned by `pool.create_task` or used for
         `await`. Read more about this in readme and docstrings below.
+
+        `rate_limit` is optional `RateLimit` object, limiting how often
+        coroutines can start on top of `size` limit, see spawning methods'
+        `key` argument for per-key limits. Coroutine, whose token is not
+        there yet, is put aside without occupying pool space, so the next
+        waiting one (with another key) starts instead.
+
+        `key_limit` caps number of active coroutines with the same `key`
+        under `size`: it's either a number, the same for all keys, or a
+        function, returning cap for given key (None for no cap). Coroutine,
+        whose key is at it's cap, is put aside until one of them finishes,
+        and the next waiting coroutine starts instead. Coroutines with key
+        None and chunks (see `map_n`) are not capped.
+
+        If `fair` is True, waiting coroutines of different jobs start in
+        turns, instead of the order of spawning: every `map`, `map_n` and
+        `itermap` call is a job of it's own, coroutines spawned one by one
+        share a job, unless `job` is passed. Job gets pool space in
+        proportion to `weight` of it's coroutines (weighted fair queueing),
+        so a big batch job does not delay a small one, spawned after it.
+        `priority` is still respected first.
+
+        `size` can be changed on the fly with `resize`, or by `controller`
+        (see `AimdController`), which gets latency and outcome of every
+        finished coroutine.
+
+        `metrics` is optional `Metrics` object, recording counters and
+        latency histograms of pool.
+
+        Spawned coroutines wait for pool space in a queue, a task is created
+        for coroutine only when it starts. With `inline_callbacks` callback
+        is awaited by the same task, right after coroutine, instead of a new
+        task for every callback.
+
+        The queue is unbounded, unless `max_waiting` is passed: no more than
+        `max_waiting` coroutines may wait for pool space, when queue is full
+        new coroutine is handled according to `overflow` policy. "block" --
+        `spawn` (and everything built on it: `exec`, `map`) waits for room
+        in queue, not blocking `spawn_n` and `map_n` raise
+        `asyncio.QueueFull` instead, as with "raise" policy for all of them.
+        "drop_new" -- new coroutine is dropped, it's future is cancelled.
+        "drop_old" -- the oldest waiting coroutine is dropped instead.
+        "priority" -- the newest of the lowest priority coroutines (new one
+        included) is dropped. Dropped coroutines are counted by `n_dropped`.
+
+        If `eager` is True (and python is 3.12+, otherwise it's ignored),
+        tasks start eagerly: coroutine runs right away, until it's first
+        suspension, so short coroutines (cache hits and so on) are done
+        without a trip through the event loop. Pool works with eager task
+        factory of the loop (and with any loop, e.g. uvloop) anyway, this
+        just makes pooled coroutines eager without changing the loop.
         '''
+        if overflow not in _OVERFLOW:
+            raise ValueError('overflow should be one of %r, got %r' %
+                             (_OVERFLOW, overflow))
+        if max_waiting is not None and max_waiting < 0:
+            raise ValueError('max_waiting should be at least 0, got %r' %
+                             (max_waiting,))
 
         self.loop = loop or _get_loop()
 
         self.size = size
+        self.rate_limit = rate_limit
+        self.controller = controller
+        self.metrics = metrics
+        self.inline_callbacks = inline_callbacks
+        self.eager = eager and _EAGER
+        self._admitting = False
+        self.key_limit = key_limit
+        self._key_active = {}  # key -> number of active coroutines
+        self._keyed = {}  # future -> key, of active capped coroutines
+        self._deferred = {}  # key -> heap of queue items waiting for it
+        self._throttled = {}  # bucket -> heap of queue items waiting for it
+        self._ready = set()  # futures, which took tokens when put aside
         self._executed = 0
         self._joined = set()
-        self._waiting = {}  # future -> task
+        # (future, coro, cb, ctx, key, waiter, timeout, retry)
+        self._queue = deque()
+        self._heap = []  # (-priority, seq, entry) of non-default priorities
+        # or (-priority, virtual time, seq, job, entry) of all, if `fair`
+        self.fair = fair
+        self.max_waiting = max_waiting
+        self.overflow = overflow
+        self._room = deque()  # futures of `spawn`s, waiting for queue room
+        self._dropped = 0
+        self._jobs = {}  # job -> virtual time of it's last queued coroutine
+        self._vtime = 0.0  # virtual time of the last started coroutine
+        self._seq = count()
+        self._waiting = {}  # future -> queue entry
         self._active = {}  # future -> task
-        self.semaphore = aio.Semaphore(value=self.size)
+        self._starting = {}  # future -> coroutine of not yet started task
+        self._deadlines = {}  # future -> loop time it expires at
+        self._timers = []  # (loop time, seq, future), some are outdated
+        self._timer = None  # loop timer for the earliest of `_timers`
+        self._timer_at = None
+        self._timed_out = set()  # futures cancelled by timeout
+        self._backoff = {}  # future -> loop timer to retry it
+        self._feeders = set()  # tasks spawning items of async iterables
+        self._grouped = {}  # future -> `Group` it was spawned in
+        self._epoch = 0  # bumped by `cancel()` for all, stops spawning them
+        self._executors = {}  # 'thread'/'process' -> executor
 
     async def __aenter__(self):
         return self
 
     async def __aexit__(self, ext_type, exc, tb):
         await self.join()
+        await self._shutdown()
 
     def __len__(self):
         return len(self._waiting) + self.n_active
@@ -45,12 +156,18 @@ class BaseAioPool(object):
     @property
     def n_active(self):
         '''Counts active coroutines'''
-        return self.size - self.semaphore._value
+        return len(self._active)
+
+    @property
+    def n_dropped(self):
+        '''Counts coroutines, dropped because of `max_waiting` overflow'''
+        return self._dropped
 
     @property
     def is_empty(self):
-        '''Returns `True` if no coroutines are active or waiting.'''
-        return 0 == len(self._waiting) == self.n_active
+        '''Returns `True` if no coroutines are active or waiting, and no
+        async iterables are being spawned.'''
+        return 0 == len(self._waiting) == self.n_active and not self._feeders
 
     @property
     def is_full(self):
@@ -79,38 +196,586 @@ class BaseAioPool(object):
             if not fut.done():
                 fut.set_result(True)
 
-    def _build_callback(self, cb, res, err=None, ctx=None):
-        # not sure if this is a safe code( in case any error:
-        # return cb(res, err, ctx), None
+    def resize(self, size):
+        '''Changes pool `size` on the fly. If pool grows, waiting coroutines
+        start right away, if it shrinks -- active coroutines are not
+        interrupted, waiting ones just won't start until there are less than
+        `size` active.'''
+
+        if size < 1:
+            raise ValueError('size should be at least 1, got %r' % (size,))
+        self.size = size
+        if self._room:
+            self._wake_room()
+        self._admit()
+
+    def _put(self, coro, cb=None, ctx=None, key=None, waiter=None,
+            priority=0, timeout=None, deadline=None, retry=None, job=None,
+            weight=1):
+        # queues `coro`, `waiter` future (if any) is resolved when it leaves
+        # queue, started or dropped
+        if self.max_waiting is not None and \
+                self._n_queued() >= self.max_waiting and \
+                not self._overflow(priority):
+            return self._refuse(coro, waiter)
+
+        future = self.loop.create_future()
+        if cb is not None:
+            cb = _resolve_cb(cb)
+        if retry is not None:  # `coro` is a coroutine function then
+            retry = (retry, coro, 1, priority, timeout, deadline, job,
+                     weight)
+            coro = coro()
+        if self.metrics is not None:
+            self.metrics.on_spawn(future)
+        group = _current_group()
+        if group is not None:
+            self._group(future, group)
+        entry = (future, coro, cb, ctx, key, waiter, timeout, retry)
+        self._enqueue(entry, priority, deadline, job, weight)
+        return future
+
+    def _n_queued(self):
+        # counts waiting coroutines, which can't start right away
+        return len(self._waiting) - max(self.size - len(self._active), 0)
+
+    def _overflow(self, priority=0):
+        # makes room in full queue for new coroutine of `priority`, dropping
+        # another one according to `overflow` policy, returns False if the
+        # new one should be dropped (or refused) instead
+        if self.overflow == 'drop_old':  # the first ones start right away
+            free = max(self.size - len(self._active), 0)
+            victim = next(islice(self._waiting, free, None), None)
+        elif self.overflow == 'priority':
+            victim = self._lowest(priority)
+        else:
+            victim = None
+        if victim is None:
+            return False
+
+        self._unqueue(victim)
+        self._drop(victim)
+        victim.cancel()
+        self._shed(victim)
+        return True
+
+    def _lowest(self, priority=0):
+        # returns future of the newest waiting coroutine with the lowest
+        # priority, if it's lower than `priority`, None otherwise
+        queue, victim = self._queue, None
+        lowest = (-priority, float('inf'))  # new coroutine is the newest
+        while queue and queue[-1][0] not in self._waiting:
+            queue.pop()  # dropped earlier
+        if queue and priority > 0:
+            victim, lowest = queue[-1][0], (0, -1)
+        for item in self._heap:  # costs O(N), but only when overflown
+            seq = item[2] if len(item) == 5 else item[1]
+            if (item[0], seq) > lowest and item[-1][0] in self._waiting:
+                victim, lowest = item[-1][0], (item[0], seq)
+        return victim
+
+    def _unqueue(self, future):
+        # removes entry of waiting `future` from queue right away, otherwise
+        # it's skipped when popped, which won't happen soon if queue is stuck
+        queue, heap = self._queue, self._heap
+        if queue and queue[0][0] is future:
+            queue.popleft()
+        elif queue and queue[-1][0] is future:
+            queue.pop()
+        else:
+            for i, item in enumerate(heap):
+                if item[-1][0] is future:
+                    heap[i] = heap[-1]
+                    heap.pop()
+                    heapq.heapify(heap)
+                    break
+
+    def _refuse(self, coro, waiter=None):
+        # new coroutine does not fit in full queue: raises `QueueFull`, or
+        # returns cancelled future for it, `waiter` is resolved anyway
+        _close(coro)
+        if waiter is not None:
+            waiter.set_result(None)
+        if self.overflow in ('block', 'raise'):
+            raise aio.QueueFull('%d coroutines are waiting for pool space '
+                                'already' % (self._n_queued(),))
+        future = self.loop.create_future()
+        if self.metrics is not None:
+            self.metrics.on_spawn(future)
+            self.metrics.on_drop(future)
+        future.cancel()
+        self._shed(future)
+        return future
+
+    def _shed(self, future):
+        # counts `future`, dropped because of overflow
+        self._dropped += 1
+        if self.metrics is not None:
+            self.metrics.on_overflow(future)
+
+    async def _wait_room(self):
+        # waits until there is room in queue for one more coroutine
+        while self._n_queued() >= self.max_waiting:
+            room = self.loop.create_future()
+            self._room.append(room)
+            try:
+                await room
+            except BaseException:
+                if room.cancelled():
+                    try:
+                        self._room.remove(room)
+                    except ValueError:
+                        pass  # skipped by `_wake_room` already
+                elif room.done():
+                    self._wake_room()  # pass it on
+                raise
+
+    def _wake_room(self):
+        # lets the next `spawn`, waiting for queue room, try again
+        while self._room:
+            room = self._room.popleft()
+            if not room.done():
+                room.set_result(None)
+                break
+
+    def _group(self, future, group):
+        # counts `future` as a member of `group` until it's done
+        group._add(future, self)
+        self._grouped[future] = group
+        future.add_done_callback(self._ungroup)
+
+    def _ungroup(self, future):
+        self._grouped.pop(future)._discard(future)
+
+    def _enter(self, future):
+        # coroutine of `future` (and it's callback) runs in it's group, so
+        # everything it spawns is a member too
+        if self._grouped or _current_group() is not None:
+            _enter_group(self._grouped.get(future))
+
+    def _enqueue(self, entry, priority=0, deadline=None, job=None, weight=1):
+        future = entry[0]
+        self._waiting[future] = entry
+        if deadline is not None:
+            self._set_deadline(future, deadline)
+        if self.fair:  # coroutine "finishes" 1 / `weight` after previous one
+            vtime = max(self._jobs.get(job, 0.0), self._vtime) + 1 / weight
+            self._jobs[job] = vtime
+            heapq.heappush(self._heap,
+                           (-priority, vtime, next(self._seq), job, entry))
+        elif priority:
+            heapq.heappush(self._heap, (-priority, next(self._seq), entry))
+        else:
+            self._queue.append(entry)
+        self._admit()
+
+    def _admit(self):
+        # starts waiting coroutines while there is pool space. Eager tasks
+        # may finish inside of `_start` and call it again, the outer loop
+        # does their job then
+        if self._admitting:
+            return
+        self._admitting = True
+        try:
+            while (self._queue or self._heap) and \
+                    len(self._active) < self.size:
+                entry = self._pop()
+                if entry is None:
+                    break  # keys of everyone left are at their caps
+                if entry[0] not in self._waiting:
+                    continue  # cancelled while waiting
+                if entry[0].done():  # cancelled outside of pool
+                    self._drop(entry[0])
+                else:
+                    self._start(entry)
+        finally:
+            self._admitting = False
+
+    def _pop(self):
+        # pops next queue entry: higher priorities first, FIFO for equal ones,
+        # default priority entries are in deque, so they cost O(1). Entries
+        # with keys at their caps are deferred, None if nothing is left
+        heap, queue = self._heap, self._queue
+        while queue or heap:
+            if heap and (heap[0][0] < 0 or not queue):
+                item = heapq.heappop(heap)
+                entry = item[-1]
+                if len(item) == 5:
+                    self._pop_fair(item)
+            else:
+                item, entry = None, queue.popleft()
+            if self.key_limit is None and self.rate_limit is None or \
+                    entry[0] not in self._waiting:
+                return entry
+            if self.key_limit is not None and self._at_cap(entry[4]):
+                heapq.heappush(self._deferred.setdefault(entry[4], []),
+                               item or (0, next(self._seq), entry))
+                self._aside(entry)
+            elif self.rate_limit is None or not self._throttle(entry, item):
+                return entry
+        return None
+
+    def _aside(self, entry):
+        # `entry` is put aside, waiting for it's key or token, `spawn` does
+        # not wait for it, so it does not stall other keys
+        waiter = entry[5]
+        if waiter is not None and not waiter.done():
+            waiter.set_result(None)
+
+    def _pop_fair(self, item):
+        # advances virtual time, forgets jobs with nothing left in queue
+        _, vtime, _, job, _ = item
+        if vtime > self._vtime:
+            self._vtime = vtime
+        if self._jobs.get(job, vtime) <= self._vtime:
+            self._jobs.pop(job, None)
+
+    def _key_cap(self, key):
+        # returns concurrency cap of `key`, or None
+        if key is None or key is _NOLIMIT:
+            return None
+        limit = self.key_limit
+        return limit(key) if callable(limit) else limit
+
+    def _at_cap(self, key):
+        cap = self._key_cap(key)
+        return cap is not None and self._key_active.get(key, 0) >= cap
+
+    def _hold_key(self, future, key):
+        # counts started coroutine against it's key cap
+        if self._key_cap(key) is not None:
+            self._key_active[key] = self._key_active.get(key, 0) + 1
+            self._keyed[future] = key
+
+    def _release_key(self, future):
+        # finished coroutine frees it's key, the next deferred coroutine with
+        # that key (by priority, then by order) goes back to queue
+        key = self._keyed.pop(future, _NOLIMIT)
+        if key is _NOLIMIT:
+            return  # not capped
+        n_active = self._key_active.pop(key) - 1
+        if n_active:
+            self._key_active[key] = n_active
+
+        deferred = self._deferred.get(key)
+        while deferred:
+            item = heapq.heappop(deferred)
+            if item[-1][0] in self._waiting:  # was not dropped meanwhile
+                self._requeue(item)
+                break
+        if not deferred:
+            self._deferred.pop(key, None)
+
+    def _requeue(self, item):
+        # puts queue item, which was put aside, back to the head of queue
+        if item[0] or len(item) == 5:
+            heapq.heappush(self._heap, item)
+        else:
+            self._queue.appendleft(item[2])
+
+    def _throttle(self, entry, item=None):
+        # puts `entry` aside, if there is no rate limit token for it yet (or
+        # others of it's bucket are aside already), returns True if so.
+        # Otherwise token is taken right away, so coroutine never waits for
+        # it while occupying pool space
+        key = entry[4]
+        if key is _NOLIMIT:
+            return False
+        if self._ready and entry[0] in self._ready:
+            self._ready.remove(entry[0])  # took it in `_unthrottle`
+            return False
+
+        bucket = self.rate_limit._bucket(key)
+        throttled = self._throttled.get(bucket)
+        if throttled is None:
+            delay = self.rate_limit._take(key)
+            if not delay:
+                return False
+            throttled = self._throttled[bucket] = []
+            self.loop.call_later(delay, self._unthrottle, bucket)
+        heapq.heappush(throttled, item or (0, next(self._seq), entry))
+        self._aside(entry)
+        return True
+
+    def _unthrottle(self, bucket):
+        # tokens of `bucket` are there, coroutines put aside for them take
+        # them and go back to the head of queue, in order
+        throttled, ready = self._throttled[bucket], []
+        while throttled:
+            entry = throttled[0][-1]
+            if entry[0] not in self._waiting:
+                heapq.heappop(throttled)  # dropped meanwhile
+                continue
+            delay = self.rate_limit._take(entry[4])
+            if delay:  # shared `RateLimit` may be used by others too
+                self.loop.call_later(delay, self._unthrottle, bucket)
+                break
+            ready.append(heapq.heappop(throttled))
+            self._ready.add(entry[0])
+        if not throttled:
+            del self._throttled[bucket]
+
+        for item in reversed(ready):
+            self._requeue(item)
+        if ready:
+            self._admit()
+
+    def _take(self, entry):
+        # takes `entry` out of waiting ones, before it starts
+        future, _, _, _, _, waiter, timeout, _ = entry
+        del self._waiting[future]
+        if self._room:
+            self._wake_room()
+        if waiter is not None and not waiter.done():
+            waiter.set_result(None)
+        if self.metrics is not None:
+            self.metrics.on_start(future)
+        if timeout is not None:
+            self._set_deadline(future, self.loop.time() + timeout)
+        if self.key_limit is not None:
+            self._hold_key(future, entry[4])
+
+    def _start(self, entry):
+        future, coro, cb, ctx, key, _, _, retry = entry
+        self._take(entry)
+        self._starting[future] = coro
+        self._run_task(future, self._wrap(coro, future, cb=cb, ctx=ctx,
+                                          key=key, retry=retry), self.eager)
 
-        bad_cb = RuntimeError('cb should accept at least one argument')
-        to_pass = (res, err, ctx)
+    def _run_task(self, future, coro, eager=False):
+        # creates task for `coro`, active for `future`. Eager task (or task
+        # of eager factory) may run `coro` to the end right here, so it's
+        # counted as active before that, and not after
+        self._active[future] = None
+        if eager:
+            task = aio.Task(coro, loop=self.loop, eager_start=True)
+        else:
+            task = self.loop.create_task(coro)
+        if future in self._active and self._active[future] is None:
+            self._active[future] = task
 
-        nargs = cb.__code__.co_argcount
-        if nargs == 0:
-            return None, bad_cb
+    def _drop(self, future):
+        # removes waiting entry, it's queue item is skipped
+        _, coro, _, _, _, waiter, _, _ = self._waiting.pop(future)
+        _close(coro)
+        if self._ready:
+            self._ready.discard(future)
+        if self._room:
+            self._wake_room()
+        if waiter is not None and not waiter.done():
+            waiter.set_result(None)
+        if self.metrics is not None:
+            self.metrics.on_drop(future)
+        if self._deadlines:
+            self._clear_deadline(future)
+        if self._backoff:
+            timer = self._backoff.pop(future, None)
+            if timer is not None:
+                timer.cancel()
 
-        # trusting user here, better ideas?
-        if cb.__code__.co_varnames[0] in ('self', 'cls'):
-            nargs -= 1  # class/instance method, skip first arg
+    def _retry(self, future, exc, cb=None, ctx=None, key=None, retry=None):
+        # schedules next attempt of crashed coroutine, if `retry` policy
+        # allows, returns True if so. Until then it is "waiting" without
+        # being in queue, so it can be cancelled or timed out as usual
+        policy, factory, attempt, priority, timeout, deadline, job, \
+            weight = retry
+        if future.done() or not policy.retries(exc, attempt):
+            return False
 
-        if nargs == 0:
-            return None, bad_cb
+        retry = (policy, factory, attempt + 1, priority, timeout, deadline,
+                 job, weight)
+        entry = (future, None, cb, ctx, key, None, timeout, retry)
+        self._waiting[future] = entry
+        self._backoff[future] = self.loop.call_later(
+            policy.delay(attempt), self._respawn, entry)
+        if deadline is not None:
+            self._set_deadline(future, deadline)
+        return True
 
+    def _respawn(self, entry):
+        future, _, cb, ctx, key, _, timeout, retry = entry
+        del self._backoff[future]
         try:
-            return cb(*to_pass[:nargs]), None
+            coro = retry[1]()
+        except Exception as e:
+            del self._waiting[future]
+            if self._room:
+                self._wake_room()
+            if self._deadlines:
+                self._clear_deadline(future)
+            future.set_exception(e)
+            if self.is_empty:
+                self._release_joined()
+            return
+
+        if self.metrics is not None:
+            self.metrics.on_retry(future)
+        entry = (future, coro, cb, ctx, key, None, timeout, retry)
+        self._enqueue(entry, retry[3], job=retry[6], weight=retry[7])
+
+    def _observe(self, started, exc=None, callback=False):
+        # reports latency and outcome of finished coroutine (or callback) to
+        # controller and metrics
+        if self.metrics is not None:
+            seconds = time.monotonic() - started
+            if callback:
+                self.metrics.on_callback(seconds, exc)
+            else:
+                self.metrics.on_exec(seconds, exc)
+        if self.controller is not None and not callback:
+            self.controller.observe(self, time.monotonic() - started, exc)
+
+    def _set_deadline(self, future, when):
+        # `future` expires at `when` (loop time), or earlier if it was set
+        # before. All the deadlines share a single heap and a single loop timer
+        prev = self._deadlines.get(future)
+        if prev is not None and prev <= when:
+            return
+        self._deadlines[future] = when
+        heapq.heappush(self._timers, (when, next(self._seq), future))
+
+        if len(self._timers) > 1024 and \
+                len(self._timers) > 2 * len(self._deadlines):
+            self._timers = [(t, next(self._seq), fut)  # drop outdated
+                            for fut, t in self._deadlines.items()]
+            heapq.heapify(self._timers)
+        self._schedule_timer()
+
+    def _clear_deadline(self, future):
+        if self._deadlines.pop(future, None) is not None and \
+                not self._deadlines:
+            self._timers = []
+            self._schedule_timer()
+
+    def _schedule_timer(self):
+        # loop timer is (re)scheduled only if earliest deadline changes
+        when = self._timers[0][0] if self._timers else None
+        if self._timer is not None:
+            if self._timer_at == when:
+                return
+            self._timer.cancel()
+            self._timer = None
+        if when is not None:
+            self._timer = self.loop.call_at(when, self._on_timer)
+        self._timer_at = when
+
+    def _on_timer(self):
+        now = max(self.loop.time(), self._timer_at)
+        self._timer = self._timer_at = None
+        timers, deadlines = self._timers, self._deadlines
+        while timers and timers[0][0] <= now:
+            when, _, future = heapq.heappop(timers)
+            if deadlines.get(future) == when:  # otherwise outdated
+                del deadlines[future]
+                self._expire(future)
+        self._schedule_timer()
+
+    def _expire(self, future):
+        # waiting `future` is dropped, active is cancelled, both get
+        # `asyncio.TimeoutError`
+        if future in self._waiting:
+            self._drop(future)
+            if not future.done():
+                future.set_exception(aio.TimeoutError())
+            if self.is_empty:
+                self._release_joined()
+        elif future in self._active:
+            self._timed_out.add(future)
+            if not self._cancel_active(future):
+                if self._timed_out:
+                    self._timed_out.discard(future)
+
+    def _timeout_error(self, future, exc):
+        # cancellation, caused by timeout, is reported as timeout
+        if self._timed_out and future in self._timed_out:
+            self._timed_out.remove(future)
+            return aio.TimeoutError()
+        return exc
+
+    def _get_executor(self, executor):
+        if isinstance(executor, Executor):
+            return executor
+
+        if executor not in self._executors:
+            if executor == 'thread':  # never more threads than active tasks
+                self._executors[executor] = ThreadPoolExecutor(self.size)
+            elif executor == 'process':
+                self._executors[executor] = ProcessPoolExecutor()
+            else:
+                raise ValueError('executor should be "thread", "process" or '
+                                 'Executor instance, got %r' % (executor,))
+        return self._executors[executor]
+
+    async def _run_sync(self, executor, fn, *args):
+        # submits `fn` to `executor` only when started by pool
+        return await self.loop.run_in_executor(
+            self._get_executor(executor), fn, *args)
+
+    def _sync_fn(self, fn, executor):
+        # makes coroutine function out of sync `fn`, if `executor` is passed
+        if executor is None:
+            return fn
+        self._get_executor(executor)  # fail early
+        return partial(self._run_sync, executor, fn)
+
+    def shutdown(self, wait=True):
+        '''Shuts down executors, created by pool for sync callables (see
+        `spawn_sync`). Called on exit from `async with` block, if pool is not
+        used as context manager -- call it yourself after `join`. Executors
+        are created again if needed.'''
+
+        executors, self._executors = self._executors, {}
+        for executor in executors.values():
+            executor.shutdown(wait=wait)
+
+    async def _shutdown(self):
+        # `shutdown` in a thread, cancelled calls may still be running in
+        # executors, and waiting for them should not block the loop
+        if self._executors:
+            await self.loop.run_in_executor(None, self.shutdown)
+
+    def _build_callback(self, cb, res, err=None, ctx=None):
+        # `cb` is resolved with `_resolve_cb`, so no signature inspection here
+        if not cb.nargs:
+            return None, RuntimeError('cb should accept at least one argument')
+        try:
+            return cb(res, err, ctx), None
         except Exception as e:
             return None, e
 
-    async def _wrap(self, coro, future, cb=None, ctx=None):
+    async def _wrap(self, coro, future, cb=None, ctx=None, key=_NOLIMIT,
+            retry=None, callback=False):
+        del self._starting[future]
+        self._enter(future)
         res, exc, tb = None, None, None
+        started = time.monotonic()
         try:
             res = await coro
         except BaseException as _exc:
+            _close(coro)  # in case it was not started
             exc = _exc
             tb = traceback.format_exc()
+            if isinstance(exc, aio.CancelledError):
+                exc = self._timeout_error(future, exc)
         finally:
             self._executed += 1
+            if not callback:
+                if self._deadlines:
+                    self._clear_deadline(future)
+                if self._timed_out:
+                    self._timed_out.discard(future)
+
+        self._observe(started, exc, callback)
+
+        if exc is not None and retry is not None and \
+                self._retry(future, exc, cb, ctx, key, retry):
+            del self._active[future]  # no pool space is used until retry
+            if self._keyed:
+                self._release_key(future)
+            if self._room:
+                self._wake_room()
+            self._admit()
+            return
 
         while cb:
             err = None if exc is None else (exc, tb)
@@ -120,11 +785,20 @@ class BaseAioPool(object):
                 exc = _cb_err  # pass to future
                 break
 
-            wrapped = self._wrap(_cb, future)
-            self.loop.create_task(wrapped)
-            return
+            if self.inline_callbacks:  # same task, no new ones
+                res, exc, started = None, None, time.monotonic()
+                try:
+                    res = await _cb
+                except BaseException as _exc:
+                    _close(_cb)
+                    exc = _exc
+                self._observe(started, exc, callback=True)
+                break
 
-        self.semaphore.release()
+            wrapped = self._wrap(_cb, future, callback=True)
+            self._starting[future] = _cb
+            self._run_task(future, wrapped)
+            return
 
         if not future.done():
             if exc:
@@ -133,33 +807,190 @@ class BaseAioPool(object):
                 future.set_result(res)
 
         del self._active[future]
+        if self._keyed:
+            self._release_key(future)
+        if self._room:
+            self._wake_room()
+        self._admit()
         if self.is_empty:
             self._release_joined()
 
-    async def _spawn(self, future, coro, cb=None, ctx=None):
-        acq_error = False
+    async def _outcome(self, fn, *args):
+        # returns (`res`, `exc`, `tb`) of awaited `fn(*args)`, cancellation
+        # of current task is re-raised
         try:
-            await self.semaphore.acquire()
-        except BaseException as e:
-            acq_error = True
-            coro.close()
-            if not future.done():
-                future.set_exception(e)
-        finally:
-            del self._waiting[future]
+            return await fn(*args), None, None
+        except aio.CancelledError:
+            raise
+        except BaseException as exc:
+            return None, exc, traceback.format_exc()
 
-        if future.done():
-            if not acq_error and future.cancelled():  # outside action
-                self.semaphore.release()
-        else:  # all good, can spawn now
-            wrapped = self._wrap(coro, future, cb=cb, ctx=ctx)
-            task = self.loop.create_task(wrapped)
-            self._active[future] = task
-        return future
+    async def _run_chunk(self, fn, chunk, futures, cb=None, ctx=None,
+            batched=False, key=None):
+        # executes `chunk` of items in a single pooled coroutine, resolving
+        # per-item `futures` as soon as items (and their callbacks) are done,
+        # rate limit is applied per item too
+        rate_limit = self.rate_limit
+        if batched:
+            if rate_limit is not None:
+                for it in chunk:
+                    await rate_limit.acquire(key(it) if key else None)
+            batch, exc, tb = await self._outcome(fn, chunk)
+            if exc is None and not isinstance(batch, (list, tuple)):
+                exc = TypeError('batched fn should return a list, got %s' %
+                                (type(batch).__name__,))
+            elif exc is None and len(batch) != len(chunk):
+                exc = ValueError('batched fn should return %d results, '
+                                 'got %d' % (len(chunk), len(batch)))
+            if exc is not None:
+                batch = [None] * len(chunk)
+
+        for i, (it, fut) in enumerate(zip(chunk, futures)):
+            if batched:
+                res = batch[i]
+            else:
+                if rate_limit is not None:
+                    await rate_limit.acquire(key(it) if key else None)
+                res, exc, tb = await self._outcome(fn, it)
+
+            if cb:
+                err = None if exc is None else (exc, tb)
+                _cb, _cb_err = self._build_callback(cb, res, err, ctx)
+                if _cb_err is not None:
+                    res, exc = None, _cb_err
+                else:
+                    res, exc, tb = await self._outcome(_await, _cb)
+
+            if not fut.done():
+                if exc:
+                    fut.set_exception(exc)
+                else:
+                    fut.set_result(res)
+
+    def _chunk(self, fn, chunk, cb=None, ctx=None, batched=False, key=None):
+        # returns coroutine for `chunk` of items and per-item futures
+        futures = [self.loop.create_future() for _ in chunk]
+        coro = self._run_chunk(fn, chunk, futures, cb, ctx, batched, key)
+        return coro, futures
 
-    async def spawn(self, coro, cb=None, ctx=None):
+    def _track_chunk(self, chunk_future, futures):
+        # items left are cancelled, when chunk is cancelled (even before it
+        # started) or crashed, or get it's `asyncio.TimeoutError`
+        def _done(chunk_future):
+            exc = None if chunk_future.cancelled() else \
+                chunk_future.exception()
+            for fut in futures:
+                if fut.done():
+                    continue
+                if isinstance(exc, aio.TimeoutError):
+                    fut.set_exception(exc)
+                else:
+                    fut.cancel()
+        chunk_future.add_done_callback(_done)
+
+    async def _spawn_next(self, _next, fn, cb=None, ctx=None, chunksize=1,
+            batched=False, key=None, priority=0, task_timeout=None,
+            deadline=None, retry=None, job=None, weight=1, wait=False):
+        # pulls next item or chunk of items with `_next` (see `_iter_next`),
+        # spawns it with `spawn_n` (or `spawn` if `wait`), returns lists of
+        # item futures (empty if nothing is left) and of futures spawned in
+        # pool, which are chunk ones for chunks. Lazy windows are bounded
+        # already, so `spawn_n` waits for queue room instead of raising
+        block = not wait and self.max_waiting is not None and \
+            self.overflow == 'block'
+        if not self._chunked(chunksize, batched, retry):
+            try:
+                it = await _next()
+            except StopAsyncIteration:
+                return [], []
+            if block:
+                await self._wait_room()
+            coro = _item_coro(fn, it, retry)
+            kwargs = dict(key=key and key(it), priority=priority,
+                timeout=task_timeout, deadline=deadline, retry=retry, job=job,
+                weight=weight)
+            if wait:
+                futures = [await self.spawn(coro, cb, ctx, **kwargs)]
+            else:
+                futures = [self.spawn_n(coro, cb, ctx, **kwargs)]
+            return futures, futures
+
+        chunk = []
+        while len(chunk) < chunksize:
+            try:
+                chunk.append(await _next())
+            except StopAsyncIteration:
+                break
+        if not chunk:
+            return [], []
+        if block:
+            await self._wait_room()
+        coro, futures = self._chunk(fn, chunk, cb, ctx, batched, key)
+        spawn = self.spawn if wait else self.spawn_n
+        chunk_future = spawn(coro, key=_NOLIMIT, priority=priority,
+                             timeout=task_timeout, deadline=deadline, job=job,
+                             weight=weight)
+        if wait:
+            chunk_future = await chunk_future
+        self._track_chunk(chunk_future, futures)
+        return futures, [chunk_future]
+
+    async def _spawn_all(self, iterable, *args, **kwargs):
+        # spawns all the items of sync or async `iterable` (see `_spawn_next`
+        # for arguments), pulling next one only when previous one started,
+        # returns list of futures
+        _next, futures, epoch = _iter_next(iterable), [], self._epoch
+        while epoch == self._epoch:
+            _futures, _ = await self._spawn_next(_next, *args, wait=True,
+                                                 **kwargs)
+            if not _futures:
+                break
+            futures.extend(_futures)
+        return futures
+
+    def _feed(self, coro):
+        # runs `coro`, spawning items of async iterable, in a task outside of
+        # pool space, pool is not empty until it's done
+        task = self.loop.create_task(coro)
+        self._feeders.add(task)
+        task.add_done_callback(self._fed)
+        group = _current_group()
+        if group is not None:  # it spawns members of the group
+            group._add(task)
+            task.add_done_callback(group._discard)
+        return task
+
+    def _fed(self, task):
+        self._feeders.discard(task)
+        if self.is_empty:
+            self._release_joined()
+
+    def _job(self, job=None):
+        # job of a mapping call, unique if not passed
+        return object() if job is None and self.fair else job
+
+    def _lazy(self, spawn_next, prefetch=0, chunksize=1, ordered=False):
+        # window of lazy mapping, `size` + `prefetch` (chunks) wide, it's
+        # exhausted by `cancel()` for all, as `_spawn_all` is
+        epoch = self._epoch
+        return _window(spawn_next,
+                       lambda: (self.size + prefetch) * chunksize,
+                       ordered, loop=self.loop,
+                       stopped=lambda: epoch != self._epoch)
+
+    def _chunked(self, chunksize=1, batched=False, retry=None):
+        # tells if items should be grouped in chunks
+        chunked = chunksize > 1 or batched
+        if chunked and retry is not None:
+            raise ValueError('retry is not supported for chunks')
+        return chunked
+
+    async def spawn(self, coro, cb=None, ctx=None, *, key=None, priority=0,
+            timeout=None, deadline=None, retry=None, job=None, weight=1):
         '''Waits for pool space and creates task for given `coro` coroutine,
-        returns a future for it's result.
+        returns a future for it's result. If coroutine is put aside, because
+        it's `key` is at it's cap (see `key_limit`), `spawn` returns right
+        away, so `map` is not stalled by a single key.
 
         If callback `cb` coroutine function (not coroutine itself!) is passed,
         `coro` result won't be assigned to created future, instead, `cb` will
@@ -178,46 +1009,170 @@ class BaseAioPool(object):
         If context `ctx` is passed to `spawn`, it will be re-sent to callback
         as third argument. If you don't plan to use any context, you can create
         callback with positional arguments only for result and error.
+
+        If pool has `rate_limit`, coroutine starts only when there is a
+        token for it, `key` selects a bucket of per-key `RateLimit`. Until
+        then it's put aside, not occupying pool space, and `spawn` returns.
+
+        Waiting coroutines start in order of their `priority`, higher first,
+        and in order of spawning for equal priorities.
+
+        If coroutine runs longer than `timeout` seconds, or is not done by
+        `deadline` (in terms of `loop.time()`, counts waiting time too) -- it
+        is cancelled (or dropped, if still waiting), and future gets
+        `asyncio.TimeoutError` (callback too, if coroutine was active).
+        Timeouts are not applied to callbacks. All of the timeouts share a
+        single timer of pool, so they are cheap.
+
+        If `retry` policy is passed (see `Retry`), `coro` should be coroutine
+        function without arguments, not coroutine: if coroutine crashes, it's
+        created again and re-spawned after backoff delay, without occupying
+        pool space while waiting. `timeout` is applied to every attempt,
+        `deadline` -- to all of them. Callback gets result of the last one.
+
+        In `fair` pool coroutine is queued as a part of `job` (any hashable,
+        None is shared by all), jobs take turns in proportion to `weight` of
+        their coroutines.
+
+        If pool has `max_waiting` with "block" `overflow` policy, `spawn`
+        waits for room in queue first.
         '''
-        future = self.loop.create_future()
-        self._waiting[future] = self.loop.create_future()  # as a placeholder
-        return await self._spawn(future, coro, cb=cb, ctx=ctx)
+        if self.max_waiting is not None and self.overflow == 'block':
+            try:
+                await self._wait_room()
+            except BaseException:
+                _close(coro)
+                raise
+        waiter = self.loop.create_future()
+        future = self._put(coro, cb=cb, ctx=ctx, key=key, waiter=waiter,
+                           priority=priority, timeout=timeout,
+                           deadline=deadline, retry=retry, job=job,
+                           weight=weight)
+        try:
+            await waiter
+        except BaseException as e:
+            if future in self._waiting:  # otherwise it's already started
+                self._drop(future)
+                if not future.done():
+                    future.set_exception(e)
+        return future
 
-    def spawn_n(self, coro, cb=None, ctx=None):
+    def spawn_n(self, coro, cb=None, ctx=None, *, key=None, priority=0,
+            timeout=None, deadline=None, retry=None, job=None, weight=1):
         '''Creates waiting task for given `coro` regardless of pool space. If
         pool is not full, this task will be executed very soon. Main difference
         is that `spawn_n` does not block and returns future very quickly.
 
-        Read more about callbacks in `spawn` docstring.
+        Read more about callbacks, `key`, `priority`, timeouts, `retry` and
+        `job` in `spawn` docstring.
         '''
-        future = self.loop.create_future()
-        task = self.loop.create_task(self._spawn(future, coro, cb=cb, ctx=ctx))
-        self._waiting[future] = task
-        return future
+        return self._put(coro, cb=cb, ctx=ctx, key=key, priority=priority,
+                         timeout=timeout, deadline=deadline, retry=retry,
+                         job=job, weight=weight)
+
+    async def spawn_sync(self, fn, *args, cb=None, ctx=None, key=None,
+            priority=0, timeout=None, deadline=None, retry=None, job=None,
+            weight=1, executor='thread'):
+        '''Waits for pool space, then calls plain sync callable `fn` with
+        `args` in `executor`, returns a future for it's result. Calls in
+        executor count against pool `size` as any other coroutine, so the
+        event loop is not blocked by CPU-heavy work, and `size` still limits
+        everything.
 
-    async def exec(self, coro, cb=None, ctx=None):
+        `executor` is "thread" or "process" for `ThreadPoolExecutor` or
+        `ProcessPoolExecutor` managed by pool (see `shutdown`), or any
+        `concurrent.futures.Executor` instance. For "process" `fn` and `args`
+        should be picklable.
+
+        Callbacks and `cancel` work as usual, but note that call already
+        running in executor can't be interrupted: it's future is cancelled
+        and pool space is released, while thread or process finishes the call
+        in background.
+
+        Read more about callbacks and `key` in `spawn` docstring, `retry`
+        calls `fn` again.
+        '''
+        coro = partial(self._sync_fn(fn, executor), *args)
+        return await self.spawn(coro if retry else coro(), cb, ctx, key=key,
+            priority=priority, timeout=timeout, deadline=deadline,
+            retry=retry, job=job, weight=weight)
+
+    async def exec(self, coro, cb=None, ctx=None, *, key=None, priority=0,
+            timeout=None, deadline=None, retry=None, job=None, weight=1):
         '''Waits for pool space, then waits for `coro` (and it's callback if
         passed) to finish, returning result of `coro` or callback (if passed),
         or raising error if smth crashed in process or was cancelled.
 
-        Read more about callbacks in `spawn` docstring.
+        Read more about callbacks and `key` in `spawn` docstring.
         '''
-        return await (await self.spawn(coro, cb, ctx))
+        return await (await self.spawn(coro, cb, ctx, key=key,
+            priority=priority, timeout=timeout, deadline=deadline,
+            retry=retry, job=job, weight=weight))
 
-    def map_n(self, fn, iterable, cb=None, ctx=None):
+    def map_n(self, fn, iterable, cb=None, ctx=None, *, executor=None,
+            chunksize=1, batched=False, key=None, priority=0,
+            task_timeout=None, deadline=None, retry=None, job=None, weight=1):
         '''Creates coroutine with `fn` function for each item in `iterable`,
         spawns each of them with `spawn_n`, returning futures.
 
-        Read more about callbacks in `spawn` docstring.
+        If `executor` is passed, `fn` is plain sync callable, executed in
+        executor (see `spawn_sync`).
+
+        If `chunksize` > 1, items are grouped in chunks, and each chunk is
+        executed by a single pooled coroutine, awaiting `fn` (and callback)
+        for it's items one by one. If `batched` is True, `fn` gets a list of
+        up to `chunksize` items and should return a list of results of the
+        same length. Returned futures are per-item anyway, but only chunks
+        occupy pool space and can be cancelled: `cancel` does not find item
+        futures, `cancel()` for all does cancel chunks and items in them.
+
+        `key` is a function, returning key for `spawn_n` for every item,
+        `priority` is the same for all of them. `task_timeout` is `timeout`
+        for every coroutine (or chunk), `deadline` is common for all. With
+        `retry` policy crashed coroutines are created with `fn` again, it's
+        not supported for chunks. In `fair` pool every call is a separate job
+        with given `weight`, unless `job` is passed.
+
+        If `iterable` is async, it can't be consumed right away: items are
+        pulled from it in background only when there is pool space for them,
+        and returned is a task, resolving to the list of futures when
+        `iterable` is exhausted. `join` waits for it too, `cancel()` for all
+        stops it.
+
+        Read more about callbacks and `key` in `spawn` docstring.
         '''
+        fn = self._sync_fn(fn, executor)
+        cb = cb and _resolve_cb(cb)
+        job = self._job(job)
+        if hasattr(iterable, '__aiter__'):
+            self._chunked(chunksize, batched, retry)  # fail early
+            return self._feed(self._spawn_all(iterable, fn, cb, ctx,
+                chunksize=chunksize, batched=batched, key=key,
+                priority=priority, task_timeout=task_timeout,
+                deadline=deadline, retry=retry, job=job, weight=weight))
+
         futures = []
+        if self._chunked(chunksize, batched, retry):
+            for chunk in _chunks(iterable, chunksize):
+                coro, _futures = self._chunk(fn, chunk, cb, ctx, batched, key)
+                chunk_future = self.spawn_n(coro, key=_NOLIMIT,
+                    priority=priority, timeout=task_timeout, deadline=deadline,
+                    job=job, weight=weight)
+                self._track_chunk(chunk_future, _futures)
+                futures.extend(_futures)
+            return futures
+
         for it in iterable:
-            fut = self.spawn_n(fn(it), cb, ctx)
+            fut = self.spawn_n(_item_coro(fn, it, retry), cb, ctx,
+                key=key and key(it), priority=priority, timeout=task_timeout,
+                deadline=deadline, retry=retry, job=job, weight=weight)
             futures.append(fut)
         return futures
 
     async def map(self, fn, iterable, cb=None, ctx=None, *,
-            get_result=getres.flat):
+            get_result=getres.flat, executor=None, chunksize=1, batched=False,
+            key=None, priority=0, task_timeout=None, deadline=None,
+            retry=None, job=None, weight=1):
         '''Spawns coroutines, created with `fn` function for each item in
         `iterable`, waits for all of them to finish, crash or be cancelled,
         returning resuls.
@@ -231,21 +1186,189 @@ class BaseAioPool(object):
         return tuple of (`result', 'exception` object) with None in place of
         missing item.
 
-        Read more about callbacks in `spawn` docstring.
+        If `executor` is passed, `fn` is plain sync callable, executed in
+        executor (see `spawn_sync`). `chunksize` and `batched` group items
+        into chunks, executed by one pooled coroutine each (see `map_n`), but
+        results are per-item anyway. `key` is a function, returning key for
+        `spawn` for every item, `priority` is the same for all of them.
+        `task_timeout` is `timeout` for every coroutine (or chunk), `deadline`
+        is common for all. `retry` policy re-creates crashed coroutines with
+        `fn` (not for chunks). In `fair` pool every call is a separate job
+        with given `weight`, unless `job` is passed.
+
+        `iterable` can be async too, next item is pulled from it only when
+        previous one has started.
+
+        Read more about callbacks and `key` in `spawn` docstring.
         '''
+        fn = self._sync_fn(fn, executor)
+        cb = cb and _resolve_cb(cb)
+        job = self._job(job)
         futures = []
-        for it in iterable:
-            fut = await self.spawn(fn(it), cb, ctx)
-            futures.append(fut)
+        if hasattr(iterable, '__aiter__'):
+            futures = await self._spawn_all(iterable, fn, cb, ctx,
+                chunksize=chunksize, batched=batched, key=key,
+                priority=priority, task_timeout=task_timeout,
+                deadline=deadline, retry=retry, job=job, weight=weight)
+        elif self._chunked(chunksize, batched, retry):
+            for chunk in _chunks(iterable, chunksize):
+                coro, _futures = self._chunk(fn, chunk, cb, ctx, batched, key)
+                chunk_future = await self.spawn(coro, key=_NOLIMIT,
+                    priority=priority, timeout=task_timeout, deadline=deadline,
+                    job=job, weight=weight)
+                self._track_chunk(chunk_future, _futures)
+                futures.extend(_futures)
+        else:
+            for it in iterable:
+                fut = await self.spawn(_item_coro(fn, it, retry), cb, ctx,
+                    key=key and key(it), priority=priority,
+                    timeout=task_timeout, deadline=deadline, retry=retry,
+                    job=job, weight=weight)
+                futures.append(fut)
 
-        await aio.wait(futures)
+        if futures:
+            await aio.wait(futures)
         return [get_result(fut) for fut in futures]
 
+    async def map_into(self, fn, iterable, sink, cb=None, ctx=None, *,
+            get_result=getres.flat, ordered=False, prefetch=0, executor=None,
+            chunksize=1, batched=False, key=None, priority=0,
+            task_timeout=None, deadline=None, retry=None, job=None,
+            weight=1):
+        '''Spawns coroutines, created with `fn` function for each item in
+        sync or async `iterable`, delivers their results (extracted with
+        `get_result`, see `map`) to `sink` as soon as they are done, returns
+        number of delivered results.
+
+        `sink` is either queue-like object with `put` (e.g. `asyncio.Queue`),
+        or writer with `write` (and `drain`, e.g. `asyncio.StreamWriter`), or
+        plain callable, accepting result. Any of these methods can be sync or
+        coroutine function, delivery is awaited before the next result is
+        delivered, so slow (or full) sink slows down spawning too.
+
+        Unlike `map`, futures are not kept: items are pulled from `iterable`
+        only when there is room for them (see lazy `itermap`, `prefetch`
+        and `ordered`), their futures are dropped right after delivery, so
+        memory usage depends on pool `size`, not on `iterable` length. If
+        `sink` raises, coroutines still in flight are cancelled, and
+        exception is re-raised.
+
+        Read about the rest of arguments in `map_n` docs.
+        '''
+        fn = self._sync_fn(fn, executor)
+        cb = cb and _resolve_cb(cb)
+        job = self._job(job)
+        self._chunked(chunksize, batched, retry)  # fail early
+        deliver = _sink(sink)
+
+        in_flight, n_delivered = set(), 0  # futures spawned in pool
+        spawn_next = partial(self._spawn_next, _iter_next(iterable), fn, cb,
+            ctx, chunksize=chunksize, batched=batched, key=key,
+            priority=priority, task_timeout=task_timeout, deadline=deadline,
+            retry=retry, job=job, weight=weight)
+
+        async def _spawn_next():
+            futures, spawned = await spawn_next()
+            for fut in spawned:
+                in_flight.add(fut)
+                fut.add_done_callback(in_flight.discard)
+            return futures, spawned
+
+        window = self._lazy(_spawn_next, prefetch, chunksize, ordered)
+        try:
+            while True:
+                await window.fill()
+                if not window:
+                    return n_delivered
+                for fut in await window.next_done():
+                    await deliver(get_result(fut))
+                    n_delivered += 1
+        except BaseException:
+            if in_flight:
+                await self.cancel(*in_flight)
+            raise
+
+    async def reduce(self, fn, iterable, reducer, initial=_NOINITIAL,
+            cb=None, ctx=None, *, get_result=None, ordered=False, prefetch=0,
+            executor=None, chunksize=1, batched=False, key=None, priority=0,
+            task_timeout=None, deadline=None, retry=None, job=None,
+            weight=1):
+        '''Spawns coroutines, created with `fn` function for each item in
+        sync or async `iterable`, folds their results with `reducer` as soon
+        as they are done: `acc = reducer(acc, res)`, starting with `initial`
+        (or with the first result, if not passed), returns the final `acc`.
+        `reducer` can be coroutine function too.
+
+        Results are folded in order of completion, so `reducer` should not
+        care about order (like `operator.add` or merging of sets), unless
+        `ordered` is True. Nothing but `acc` and coroutines in flight is
+        kept, see `map_into`, which does the spawning.
+
+        By default, exception of the first crashed (or cancelled) coroutine
+        is raised, the rest of them are cancelled, pass `get_result` (see
+        `map`) to fold exceptions too.
+
+        Read about the rest of arguments in `map_n` docs.
+        '''
+        acc = [initial]
+
+        async def fold(res):
+            if acc[0] is _NOINITIAL:
+                acc[0] = res
+                return
+            res = reducer(acc[0], res)
+            if inspect.isawaitable(res):
+                res = await res
+            acc[0] = res
+
+        await self.map_into(fn, iterable, fold, cb, ctx,
+            get_result=get_result or _result, ordered=ordered,
+            prefetch=prefetch, executor=executor, chunksize=chunksize,
+            batched=batched, key=key, priority=priority,
+            task_timeout=task_timeout, deadline=deadline, retry=retry,
+            job=job, weight=weight)
+        if acc[0] is _NOINITIAL:
+            raise TypeError('reduce of empty iterable with no initial value')
+        return acc[0]
+
     async def itermap(self, fn, iterable, cb=None, ctx=None, *, flat=True,
-            get_result=getres.flat, timeout=None, yield_when=aio.ALL_COMPLETED):
+            get_result=getres.flat, timeout=None, yield_when=aio.ALL_COMPLETED,
+            lazy=False, prefetch=0, ordered=False, executor=None, chunksize=1,
+            batched=False, key=None, priority=0, task_timeout=None,
+            deadline=None, retry=None, job=None, weight=1):
         '''Spawns coroutines created with `fn` for each item in `iterable`, then
         waits for results with `iterwait` (implementation specific). See docs
         for `map_n` and `iterwait` (in mixins for py3.5 and py3.6+).
+
+        If `executor` is passed, `fn` is plain sync callable, executed in
+        executor (see `spawn_sync`).
+
+        `chunksize` and `batched` group items into chunks, executed by one
+        pooled coroutine each (see `map_n`), results are still yielded
+        per-item. In `lazy` mode `size` + `prefetch` is counted in chunks.
+        `key` is a function, returning key for `spawn_n` for every item,
+        `priority` is the same for all of them.
+
+        `task_timeout` is `timeout` of `spawn_n` for every coroutine (or
+        chunk), `deadline` is common for all of them. Note that `timeout`
+        only limits waiting for results and does not cancel anything.
+        `retry` policy re-creates crashed coroutines with `fn`. In `fair`
+        pool every call is a separate job with given `weight`, unless `job` is
+        passed.
+
+        If `lazy` is True (always for async `iterable`) -- items are pulled
+        from `iterable` only when there is room for them: no more than
+        `size` + `prefetch` coroutines are spawned and not yet yielded at the
+        same time, so memory usage does not depend on `iterable` length.
+        `timeout` and `yield_when` are applied to this window of spawned
+        coroutines, so you probably want `yield_when=asyncio.FIRST_COMPLETED`
+        to keep pool busy.
+
+        If `ordered` is True -- results are yielded in `iterable` order, as
+        soon as all the previous ones are yielded (`yield_when` is ignored).
+        Implies `lazy`, so `size` + `prefetch` is the size of reorder buffer:
+        if the oldest coroutine is slow, no new ones are spawned until it is
+        done.
         '''
         raise NotImplementedError('Use one of mixins')
 
@@ -259,27 +1382,220 @@ class BaseAioPool(object):
         Returns tuple of (`cancelled` count of cancelled tasks, `results`
         collected from futures of cancelled tasks).
         '''
-        tasks, _futures = [], []
-
         if not futures:  # meaning cancel all
-            tasks.extend(self._waiting.values())
-            tasks.extend(self._active.values())
-            _futures.extend(self._waiting.keys())
-            _futures.extend(self._active.keys())
-        else:
-            for fut in futures:
-                task = self._active.get(fut, self._waiting.get(fut))
-                if task:
-                    tasks.append(task)
-                    _futures.append(fut)
-
-        cancelled = 0
-        if tasks:
-            cancelled = sum(1 for task in tasks if task.cancel())
-            await aio.wait(tasks)  # let them actually cancel
+            self._epoch += 1  # stop spawning async iterables
+            feeders, self._feeders = self._feeders, set()
+            for feeder in feeders:
+                feeder.cancel()
+            futures = list(self._waiting) + list(self._active)
+
+        cancelled, _futures, active = 0, [], []
+        for fut in futures:
+            if fut in self._waiting:
+                self._drop(fut)
+                cancelled += fut.cancel()
+            elif fut in self._active:
+                cancelled += self._cancel_active(fut)
+                active.append(fut)
+            else:
+                continue
+            _futures.append(fut)
+
+        if active:
+            await aio.wait(active)  # let them actually cancel
+        if self.is_empty:
+            self._release_joined()
         # need to collect them anyway, to supress warnings
         return cancelled, [get_result(fut) for fut in _futures]
 
+    def _cancel_active(self, future):
+        # cancels execution of active coroutine, returns True if cancelled
+        task = self._active[future]
+        if task is None:
+            return False  # it's cancelling itself, while starting eagerly
+        task.add_done_callback(partial(self._cancelled, future))
+        return task.cancel()
+
+    def _cancelled(self, future, task):
+        # task, cancelled before it started, did not run `_wrap` to clean up
+        if self._active.get(future) is not task:
+            return
+        del self._active[future]
+        if self._keyed:
+            self._release_key(future)
+        if self._room:
+            self._wake_room()
+        _close(self._starting.pop(future))
+        if self._deadlines:
+            self._clear_deadline(future)
+        exc = self._timeout_error(future, aio.CancelledError())
+        self._observe(time.monotonic(), exc)
+        if not future.done():
+            future.set_exception(exc)
+        self._admit()
+        if self.is_empty:
+            self._release_joined()
+
+
+def _item_coro(fn, it, retry=None):
+    # coroutine for item, or coroutine function if it will be retried
+    return partial(fn, it) if retry is not None else fn(it)
+
+
+async def _await(awaitable):
+    # for `_outcome` of already created coroutine
+    return await awaitable
+
+
+def _chunks(iterable, chunksize):
+    # splits sync `iterable` into lists of `chunksize` items
+    iterator = iter(iterable)
+    chunk = list(islice(iterator, chunksize))
+    while chunk:
+        yield chunk
+        chunk = list(islice(iterator, chunksize))
+
+
+def _iter_next(iterable):
+    '''Returns coroutine function, which returns next item of sync or async
+    `iterable` on every call, raising `StopAsyncIteration` when exhausted.'''
+
+    if hasattr(iterable, '__aiter__'):
+        return iterable.__aiter__().__anext__
+
+    iterator = iter(iterable)
+
+    async def _next():
+        try:
+            return next(iterator)
+        except StopIteration:
+            raise StopAsyncIteration()
+    return _next
+
+
+class _window(object):
+    # futures of lazy mapping in flight: `fill` spawns (or sends) more
+    # with `spawn_next` (returns lists of item futures, empty when nothing
+    # is left, and of spawned ones, see `_spawn_next`) while there are
+    # less than `limit()` of them, and until `stopped()`, `next_done` takes
+    # done ones, in order of completion, or from the head only if `ordered`
+
+    def __init__(self, spawn_next, limit, ordered=False, loop=None,
+            stopped=None):
+        self.spawn_next = spawn_next
+        self.limit = limit
+        self.stopped = stopped
+        self.ordered = ordered
+        self.exhausted = False
+        self.futures = deque() if ordered else CompletionQueue(loop=loop)
+        self.push = self.futures.append if ordered else self.futures.add
+
+    def __len__(self):
+        return len(self.futures)
+
+    async def fill(self):
+        while not self.exhausted and len(self.futures) < self.limit():
+            if self.stopped is not None and self.stopped():
+                self.exhausted = True
+                break
+            futures, _ = await self.spawn_next()
+            self.exhausted = not futures
+            for fut in futures:
+                self.push(fut)
+
+    async def next_done(self, timeout=None, return_when=aio.FIRST_COMPLETED):
+        # returns list of done futures, empty if `timeout` is over first,
+        # `return_when` is ignored if `ordered`
+        if not self.ordered:
+            return await self.futures.wait(timeout=timeout,
+                                           return_when=return_when)
+        futures, done = self.futures, []
+        await aio.wait([futures[0]], timeout=timeout)
+        while futures and futures[0].done():
+            done.append(futures.popleft())
+        return done
+
+
+def _result(future):
+    # result of `future`, or it's exception raised
+    return future.result()
+
+
+def _sink(sink):
+    '''Returns coroutine function, delivering result to `sink`: queue-like
+    object with `put`, writer with `write` (and `drain`) or callable.'''
+
+    drain = None
+    if hasattr(sink, 'put'):
+        put = sink.put
+    elif hasattr(sink, 'write'):
+        put, drain = sink.write, getattr(sink, 'drain', None)
+    elif callable(sink):
+        put = sink
+    else:
+        raise TypeError('sink should have `put` or `write` method, or be '
+                        'callable, got %r' % (sink,))
+
+    async def deliver(res):
+        ret = put(res)
+        if inspect.isawaitable(ret):
+            await ret
+        if drain is not None:
+            await drain()
+    return deliver
+
+
+def _close(coro):
+    # closes coroutine, which may be never awaited, ignores anything else
+    # (callback could return not a coroutine)
+    if hasattr(coro, 'close'):
+        coro.close()
+
+
+def _resolve_cb(cb):
+    # wraps callback, resolving it's signature once per spawning call
+    return cb if isinstance(cb, _callback) else _callback(cb)
+
+
+class _callback(object):
+    # callback with known number of positional arguments it accepts (up to
+    # 3), so it's called without any inspection
+
+    def __init__(self, fn):
+        self.fn = fn
+        self.nargs = _cb_nargs(fn)
+
+    def __call__(self, res, err=None, ctx=None):
+        nargs = self.nargs
+        if nargs == 1:
+            return self.fn(res)
+        if nargs == 2:
+            return self.fn(res, err)
+        return self.fn(res, err, ctx)
+
+
+def _cb_nargs(fn):
+    # counts positional arguments of `fn`: functions and methods by their
+    # code, anything else (`partial`, callable objects) by signature
+    if inspect.isfunction(fn) or inspect.ismethod(fn):
+        code = fn.__code__
+        if code.co_flags & inspect.CO_VARARGS:
+            return 3
+        nargs = code.co_argcount - inspect.ismethod(fn)  # bound self/cls
+    else:
+        try:
+            params = inspect.signature(fn).parameters.values()
+        except (TypeError, ValueError):  # builtins may have no signature
+            return 3
+        nargs = 0
+        for param in params:
+            if param.kind == param.VAR_POSITIONAL:
+                return 3
+            if param.kind in (param.POSITIONAL_ONLY,
+                              param.POSITIONAL_OR_KEYWORD):
+                nargs += 1
+    return min(nargs, 3)
+
 
 def _get_loop():
     """
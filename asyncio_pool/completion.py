@@ -0,0 +1,80 @@
+'''Queue of futures in order of their completion'''
+
+import asyncio as aio
+from collections import deque
+
+
+class CompletionQueue(object):
+
+    def __init__(self, futures=(), *, loop=None):
+        '''Collects `futures` in order of their completion with a single done
+        callback per future, so waiting for N results costs O(N) total, as
+        opposed to `asyncio.wait` in a loop, which re-registers callbacks on
+        every remaining future on every call.
+
+        More futures can be added with `add`. `len` counts both pending and
+        done but not yet taken futures.
+        '''
+        self.loop = loop
+        self.n_pending = 0
+        self._done = deque()
+        self._waiter = None
+        self._return_when = None
+        for fut in futures:
+            self.add(fut)
+
+    def __len__(self):
+        return self.n_pending + len(self._done)
+
+    def add(self, future):
+        '''Adds `future` to queue, it will be taken with `wait` when done.'''
+        self.n_pending += 1
+        future.add_done_callback(self._on_done)
+
+    def _on_done(self, future):
+        self.n_pending -= 1
+        self._done.append(future)
+
+        when = self._return_when
+        if when is None:
+            return  # nobody waits
+        if when == aio.FIRST_COMPLETED or self.n_pending == 0 or \
+                (when == aio.FIRST_EXCEPTION and not future.cancelled() and
+                 future.exception() is not None):
+            self._wake()
+
+    def _wake(self):
+        if self._waiter is not None and not self._waiter.done():
+            self._waiter.set_result(None)
+
+    def _ready(self, return_when):
+        if self.n_pending == 0:
+            return True
+        if return_when == aio.FIRST_COMPLETED:
+            return bool(self._done)
+        if return_when == aio.FIRST_EXCEPTION:
+            return any(not fut.cancelled() and fut.exception() is not None
+                       for fut in self._done)
+        return False
+
+    async def wait(self, timeout=None, return_when=aio.ALL_COMPLETED):
+        '''Waits for done futures (same `timeout` and `return_when` semantics
+        as of `asyncio.wait`), returns list of them in order of completion,
+        removing them from queue.'''
+
+        if not self._ready(return_when):
+            loop = self.loop or aio.get_event_loop()
+            self._waiter = loop.create_future()
+            self._return_when = return_when
+            handle = None
+            if timeout is not None:
+                handle = loop.call_later(timeout, self._wake)
+            try:
+                await self._waiter
+            finally:
+                if handle is not None:
+                    handle.cancel()
+                self._waiter = self._return_when = None
+
+        done, self._done = list(self._done), deque()
+        return done
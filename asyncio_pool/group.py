@@ -0,0 +1,105 @@
+'''Groups of pooled coroutines, spawned recursively, with a single join'''
+
+import asyncio as aio
+
+try:
+    import contextvars
+    _group = contextvars.ContextVar('asyncio_pool_group', default=None)
+except ImportError:  # python3.6 and older
+    _group = None
+
+
+class Group(object):
+
+    def __init__(self):
+        '''Tree of coroutines: everything spawned (into any pools) inside of
+        `async with group:` block, and, recursively, everything spawned by
+        those coroutines and by their callbacks. Plain tasks, created by them
+        (e.g. with `ensure_future`), are not members themselves: whatever
+        they spawn is counted only when it's spawned, and group may be done
+        by then, so await such tasks in member coroutine, or spawn them into
+        a pool instead.
+
+        `join` waits until the whole tree is done, including callbacks,
+        which is what recursive workloads (crawlers and so on) need: pool's
+        `join` and `is_empty` can't tell a finished tree from a callback,
+        which is about to spawn the next level, and group can, because
+        children are counted before their parent is done. Tree can span
+        several pools, it's bookkeeping is a dict of futures, so checks are
+        O(1) regardless of what else pools are running.
+
+        On exit from `async with` block group is joined, or cancelled first
+        if block raised. Do not `join` group inside of it's own coroutines.
+        Requires `contextvars` (python3.7+).
+        '''
+        if _group is None:
+            raise RuntimeError('groups require contextvars, python3.7+')
+        self._members = {}  # future -> pool, or feeder task -> None
+        self._joined = set()
+        self._tokens = []
+
+    async def __aenter__(self):
+        self._tokens.append(_group.set(self))
+        return self
+
+    async def __aexit__(self, ext_type, exc, tb):
+        _group.reset(self._tokens.pop())
+        if ext_type is not None:
+            await self.cancel()
+        await self.join()
+
+    def __len__(self):
+        return len(self._members)
+
+    @property
+    def is_empty(self):
+        '''Returns `True` if every coroutine of the tree is done.'''
+        return not self._members
+
+    async def join(self):
+        '''Waits for every coroutine of the tree (and it's callback) to
+        finish, including ones spawned while waiting.'''
+        if not self._members:
+            return True
+
+        fut = aio.get_event_loop().create_future()
+        self._joined.add(fut)
+        try:
+            return await fut
+        finally:
+            self._joined.remove(fut)
+
+    async def cancel(self):
+        '''Cancels active and waiting coroutines of the tree, returns count
+        of cancelled ones. Callbacks of cancelled coroutines are still
+        executed and may spawn more, see `join`.'''
+        cancelled, by_pool = 0, {}
+        for fut, pool in list(self._members.items()):
+            if pool is None:
+                cancelled += fut.cancel()
+            else:
+                by_pool.setdefault(pool, []).append(fut)
+        for pool, futures in by_pool.items():
+            cancelled += (await pool.cancel(*futures))[0]
+        return cancelled
+
+    def _add(self, future, pool=None):
+        # `future` is a member until `_discard` is called for it
+        self._members[future] = pool
+
+    def _discard(self, future):
+        del self._members[future]
+        if not self._members:
+            for fut in self._joined:
+                if not fut.done():
+                    fut.set_result(True)
+
+
+def _current_group():
+    # group of current context, if any
+    return _group.get() if _group is not None else None
+
+
+def _enter_group(group):
+    # makes `group` current, for everything running in current task
+    _group.set(group)
@@ -0,0 +1,150 @@
+'''Opt-in metrics of pool: counters and latency histograms'''
+
+import time
+import asyncio as aio
+from bisect import bisect_left
+
+
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5,
+                   1, 2.5, 5, 10, 30, 60)
+
+
+class Histogram(object):
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        '''Counts values (seconds) in fixed buckets, `buckets` are their
+        sorted upper bounds, values above the last one go to "+Inf" bucket.
+        Memory does not depend on number of values.'''
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+        if value > self.max:
+            self.max = value
+
+    def quantile(self, q):
+        '''Returns upper bound of bucket with `q`-quantile (0 < `q` <= 1), so
+        it's an estimation from above, or `max` for the last bucket.'''
+        if not self.count:
+            return 0.0
+        rank, seen = q * self.count, 0
+        for bound, n in zip(self.buckets, self.counts):
+            seen += n
+            if seen >= rank:
+                return min(bound, self.max)
+        return self.max
+
+    def snapshot(self):
+        bounds = [str(b) for b in self.buckets] + ['+Inf']
+        return {
+            'count': self.count,
+            'sum': self.sum,
+            'mean': self.sum / self.count if self.count else 0.0,
+            'max': self.max,
+            'p50': self.quantile(0.5),
+            'p90': self.quantile(0.9),
+            'p99': self.quantile(0.99),
+            'buckets': dict(zip(bounds, self.counts)),
+        }
+
+
+class Metrics(object):
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        '''Pool metrics, pass it to pool as `metrics` to enable. Records time
+        coroutines wait for pool space (`wait`), time of their execution
+        (`exec`, rate limit wait is not counted) and of their callbacks
+        (`callback`) in `Histogram`s with `buckets` and counts spawned,
+        started, finished, crashed (`errors`), `cancelled` ones (both active
+        and waiting), `retries` (see `Retry`) and `dropped` ones (because of
+        `max_waiting` overflow, counted as cancelled too). Chunks (see
+        `map_n`) are counted as single coroutines.
+
+        `snapshot` returns all of them as dict, `hooks` are called with
+        (`event`, `seconds`, `exc`) for every recorded value, where `event` is
+        "wait", "exec" or "callback", `exc` is exception or None.
+
+        Without metrics pool does nothing but a few `is None` checks.
+        '''
+        self.hooks = []
+        self.buckets = tuple(sorted(buckets))
+        self.reset()
+
+    def reset(self):
+        '''Resets all the counters and histograms.'''
+        self.started_at = time.monotonic()
+        self.spawned = self.started = self.finished = 0
+        self.errors = self.cancelled = self.retries = self.dropped = 0
+        self.wait = Histogram(self.buckets)
+        self.exec = Histogram(self.buckets)
+        self.callback = Histogram(self.buckets)
+        self._queued = {}  # future -> time it was spawned
+
+    def _emit(self, event, seconds, exc=None):
+        for hook in self.hooks:
+            hook(event, seconds, exc)
+
+    def on_spawn(self, future):
+        self.spawned += 1
+        self._queued[future] = time.monotonic()
+
+    def on_start(self, future):
+        self.started += 1
+        queued = self._queued.pop(future, None)
+        if queued is not None:
+            seconds = time.monotonic() - queued
+            self.wait.observe(seconds)
+            if self.hooks:
+                self._emit('wait', seconds)
+
+    def on_retry(self, future):
+        self.retries += 1
+        self._queued[future] = time.monotonic()
+
+    def on_drop(self, future):
+        self.cancelled += 1
+        self._queued.pop(future, None)
+
+    def on_overflow(self, future):
+        self.dropped += 1
+
+    def on_exec(self, seconds, exc=None):
+        self.finished += 1
+        if exc is not None:
+            if isinstance(exc, aio.CancelledError):
+                self.cancelled += 1
+            else:
+                self.errors += 1
+        self.exec.observe(seconds)
+        if self.hooks:
+            self._emit('exec', seconds, exc)
+
+    def on_callback(self, seconds, exc=None):
+        self.callback.observe(seconds)
+        if self.hooks:
+            self._emit('callback', seconds, exc)
+
+    def snapshot(self):
+        '''Returns dict with counters, `throughput` (finished coroutines per
+        second since creation or `reset`) and histograms' snapshots.'''
+        uptime = time.monotonic() - self.started_at
+        return {
+            'uptime': uptime,
+            'spawned': self.spawned,
+            'started': self.started,
+            'finished': self.finished,
+            'errors': self.errors,
+            'cancelled': self.cancelled,
+            'retries': self.retries,
+            'dropped': self.dropped,
+            'throughput': self.finished / uptime if uptime > 0 else 0.0,
+            'wait': self.wait.snapshot(),
+            'exec': self.exec.snapshot(),
+            'callback': self.callback.snapshot(),
+        }
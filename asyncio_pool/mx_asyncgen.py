@@ -1,25 +1,29 @@
 '''Mixin for BaseAioPool with async generator features, python3.6+'''
 
 import asyncio as aio
+from functools import partial
 from .results import getres
+from .base_pool import _iter_next, _resolve_cb
+from .completion import CompletionQueue
 
 
 async def iterwait(futures, *, flat=True, get_result=getres.flat,
         timeout=None, yield_when=aio.ALL_COMPLETED):
-    '''Wraps `asyncio.wait` into asynchronous generator, accessible with
-    `async for` syntax. May be useful in conjunction with `spawn_n`.
+    '''Asynchronous generator, yielding results of `futures` as they are
+    done, accessible with `async for` syntax. May be useful in conjunction
+    with `spawn_n`.
 
-    `timeout` and `yield_when` parameters are passed to `asyncio.wait`, see
-    documentation for this great instrument.
+    `timeout` and `yield_when` parameters have the same meaning as in
+    `asyncio.wait`, but futures are tracked with a single done callback each
+    (see `CompletionQueue`), so waiting for N futures costs O(N) total.
 
     Returns results for provided futures, as soon as results are ready. If
     `flat` is True -- generates one result at a time (per `async for`). If
     `flat` is False -- generates a list of ready results.
     '''
-    _futures = futures[:]
-    while _futures:
-        done, _futures = await aio.wait(_futures, timeout=timeout,
-                                        return_when=yield_when)
+    queue = CompletionQueue(futures)
+    while queue:
+        done = await queue.wait(timeout=timeout, return_when=yield_when)
         if flat:
             for fut in done:
                 yield get_result(fut)
@@ -32,12 +36,64 @@ class MxAsyncGenPool(object):
 
     async def itermap(self, fn, iterable, cb=None, ctx=None, *, flat=True,
             get_result=getres.flat, timeout=None,
-            yield_when=aio.ALL_COMPLETED):
+            yield_when=aio.ALL_COMPLETED, lazy=False, prefetch=0,
+            ordered=False, executor=None, chunksize=1, batched=False,
+            key=None, priority=0, task_timeout=None, deadline=None,
+            retry=None, job=None, weight=1):
         '''Spawns coroutines created with `fn` for each item in `iterable`, then
         waits for results with `iterwait`. See docs for `map_n` and `iterwait`.
+
+        If `lazy` is True (or `iterable` is async) -- pulls items from
+        `iterable` only when there is room for them, if `ordered` is True --
+        also yields results in `iterable` order, if `executor` is passed --
+        `fn` is plain sync callable, `chunksize` and `batched` group items in
+        chunks, `key` returns spawning key for item, `priority` is spawning
+        priority of all items, `task_timeout` and `deadline` cancel slow
+        coroutines, `retry` re-spawns crashed ones, `job` and `weight` are
+        for `fair` pools, see `BaseAioPool.itermap` docs.
         '''
-        futures = self.map_n(fn, iterable, cb, ctx)
-        generator = iterwait(futures, flat=flat, timeout=timeout,
-                get_result=get_result, yield_when=yield_when)
+        fn = self._sync_fn(fn, executor)
+        cb = cb and _resolve_cb(cb)
+        job = self._job(job)
+        self._chunked(chunksize, batched, retry)  # fail early
+        if lazy or ordered or hasattr(iterable, '__aiter__'):
+            generator = self._iterlazy(fn, iterable, cb, ctx, flat=flat,
+                get_result=get_result, timeout=timeout, yield_when=yield_when,
+                prefetch=prefetch, ordered=ordered, chunksize=chunksize,
+                batched=batched, key=key, priority=priority,
+                task_timeout=task_timeout, deadline=deadline, retry=retry,
+                job=job, weight=weight)
+        else:
+            futures = self.map_n(fn, iterable, cb, ctx, chunksize=chunksize,
+                batched=batched, key=key, priority=priority,
+                task_timeout=task_timeout, deadline=deadline, retry=retry,
+                job=job, weight=weight)
+            generator = iterwait(futures, flat=flat, timeout=timeout,
+                    get_result=get_result, yield_when=yield_when)
         async for batch in generator:
             yield batch  # TODO is it possible to return a generator?
+
+    async def _iterlazy(self, fn, iterable, cb=None, ctx=None, *, flat=True,
+            get_result=getres.flat, timeout=None,
+            yield_when=aio.ALL_COMPLETED, prefetch=0, ordered=False,
+            chunksize=1, batched=False, key=None, priority=0,
+            task_timeout=None, deadline=None, retry=None, job=None, weight=1):
+        # Spawns new coroutines only when previous ones are yielded, keeping
+        # at most `size` + `prefetch` of them (or of chunks of `chunksize`
+        # items) in flight. If `ordered` -- in-flight futures are kept in
+        # order and yielded from the head only.
+        window = self._lazy(partial(self._spawn_next, _iter_next(iterable),
+            fn, cb, ctx, chunksize=chunksize, batched=batched, key=key,
+            priority=priority, task_timeout=task_timeout, deadline=deadline,
+            retry=retry, job=job, weight=weight), prefetch, chunksize, ordered)
+        while True:
+            await window.fill()
+            if not window:
+                break
+
+            done = await window.next_done(timeout, yield_when)
+            if flat:
+                for fut in done:
+                    yield get_result(fut)
+            else:
+                yield [get_result(fut) for fut in done]
@@ -4,6 +4,8 @@ import asyncio as aio
 from collections import deque
 from functools import partial
 from .results import getres
+from .base_pool import _iter_next, _resolve_cb
+from .completion import CompletionQueue
 
 
 class iterwait:
@@ -13,9 +15,9 @@ class iterwait:
 
         self.results = deque()
         self.flat = flat
-        self._futures = futures
+        self._futures = CompletionQueue(futures, loop=loop)
         self._getres = get_result
-        self._wait = partial(aio.wait, timeout=timeout, loop=loop,
+        self._wait = partial(self._futures.wait, timeout=timeout,
                              return_when=yield_when)
 
     def __aiter__(self):
@@ -30,7 +32,7 @@ class iterwait:
 
     async def _wait_next(self):
         while True:
-            done, self._futures = await self._wait(self._futures)
+            done = await self._wait()
             if done:
                 batch = [self._getres(fut) for fut in done]
                 if self.flat:
@@ -40,15 +42,70 @@ class iterwait:
                 break
 
 
+class iterlazy(iterwait):
+
+    def __init__(self, pool, fn, iterable, cb=None, ctx=None, *, flat=True,
+            get_result=getres.flat, timeout=None,
+            yield_when=aio.ALL_COMPLETED, prefetch=0, ordered=False,
+            chunksize=1, batched=False, key=None, priority=0,
+            task_timeout=None, deadline=None, retry=None, job=None, weight=1,
+            loop=None):
+
+        super().__init__((), flat=flat, get_result=get_result,
+            timeout=timeout, yield_when=yield_when, loop=loop)
+        # spawns new coroutines only when previous ones are done, keeping
+        # at most `size` + `prefetch` of them (or of chunks) in flight, if
+        # `ordered` -- yields from the head only
+        self._futures = pool._lazy(partial(pool._spawn_next,
+            _iter_next(iterable), fn, cb, ctx, chunksize=chunksize,
+            batched=batched, key=key, priority=priority,
+            task_timeout=task_timeout, deadline=deadline, retry=retry,
+            job=job, weight=weight), prefetch, chunksize, ordered)
+        self._wait = partial(self._futures.next_done, timeout=timeout,
+                             return_when=yield_when)
+
+    async def __anext__(self):
+        await self._futures.fill()
+        return await super().__anext__()
+
+
 class MxAsyncIterPool(object):
 
     def itermap(self, fn, iterable, cb=None, ctx=None, *, flat=True,
             get_result=getres.flat, timeout=None,
-            yield_when=aio.ALL_COMPLETED):
+            yield_when=aio.ALL_COMPLETED, lazy=False, prefetch=0,
+            ordered=False, executor=None, chunksize=1, batched=False,
+            key=None, priority=0, task_timeout=None, deadline=None,
+            retry=None, job=None, weight=1):
         '''Spawns coroutines created with `fn` for each item in `iterable`, then
         waits for results with `iterwait`. See docs for `map_n` and `iterwait`.
+
+        If `lazy` is True (or `iterable` is async) -- pulls items from
+        `iterable` only when there is room for them, if `ordered` is True --
+        also yields results in `iterable` order, if `executor` is passed --
+        `fn` is plain sync callable, `chunksize` and `batched` group items in
+        chunks, `key` returns spawning key for item, `priority` is spawning
+        priority of all items, `task_timeout` and `deadline` cancel slow
+        coroutines, `retry` re-spawns crashed ones, `job` and `weight` are
+        for `fair` pools, see `BaseAioPool.itermap` docs.
         '''
-        mk_map = partial(self.map_n, fn, iterable, cb=cb, ctx=ctx)
+        fn = self._sync_fn(fn, executor)
+        cb = cb and _resolve_cb(cb)
+        job = self._job(job)
+        self._chunked(chunksize, batched, retry)  # fail early
+        if lazy or ordered or hasattr(iterable, '__aiter__'):
+            return iterlazy(self, fn, iterable, cb, ctx, flat=flat,
+                get_result=get_result, timeout=timeout, yield_when=yield_when,
+                prefetch=prefetch, ordered=ordered, chunksize=chunksize,
+                batched=batched, key=key, priority=priority,
+                task_timeout=task_timeout, deadline=deadline, retry=retry,
+                job=job, weight=weight, loop=self.loop)
+
+        mk_map = partial(self.map_n, fn, iterable, cb=cb, ctx=ctx,
+                         chunksize=chunksize, batched=batched, key=key,
+                         priority=priority, task_timeout=task_timeout,
+                         deadline=deadline, retry=retry, job=job,
+                         weight=weight)
         mk_waiter = partial(iterwait, flat=flat, loop=self.loop,
                             get_result=get_result, timeout=timeout,
                             yield_when=yield_when)
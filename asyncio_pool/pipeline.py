@@ -0,0 +1,286 @@
+'''Multi-stage pipelines of pools, connected by bounded queues'''
+
+import time
+import asyncio as aio
+from .results import getres
+from . import AioPool
+from .base_pool import _resolve_cb
+from .worker_pool import _current_task
+
+
+_DONE = object()  # end of stage output
+_ON_ERROR = ('raise', 'skip', 'yield')
+
+
+class Pipeline(object):
+
+    def __init__(self, *, ordered=False):
+        '''Chain of pools (stages, see `stage`): results of every stage are
+        items of the next one, results of the last one are yielded by
+        `async for res in pipeline.run(iterable)`.
+
+        Stages are connected by bounded queues, every stage pulls items with
+        `map_into` only when it has pool space for them, and waits when
+        next stage's queue is full -- so the whole pipeline runs at the rate
+        of it's slowest stage, and memory usage does not depend on `iterable`
+        length. If `ordered` is True, every stage keeps items in order (see
+        `itermap`), so results are yielded in order of `iterable`.
+
+        Supports async context manager interface, on exit everything still
+        running is cancelled (see `aclose`), only items of pipeline are
+        cancelled in pools passed to stages. Throughput and queue depth of
+        stages are reported by `stats`.
+        '''
+        self.ordered = ordered
+        self.stages = []
+        self._tasks = []
+        self._out = None
+        self._error = None
+        self._started = None
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, ext_type, exc, tb):
+        await self.aclose()
+
+    def stage(self, fn, size=1, cb=None, ctx=None, *, maxsize=None,
+            on_error='raise', name=None, pool=None, **kwargs):
+        '''Adds stage, processing items with `fn` coroutine function in a
+        pool of `size` (or in given `pool`, e.g. `AioWorkerPool` with rate
+        limit or metrics), with `cb` and `ctx` callback as usual. `kwargs`
+        are passed to `map_into`: `executor`, `chunksize`, `key`, `retry`,
+        `task_timeout` and so on. Returns pipeline, so calls can be chained.
+
+        Up to `maxsize` (default is `size`) results wait in queue for the next
+        stage. Crashed items are handled according to `on_error`: "raise"
+        cancels the whole pipeline and re-raises exception from `run`, "skip"
+        drops the item, "yield" passes exception object right to the output
+        of pipeline, skipping stages left (in it's place, if `ordered`).
+        '''
+        if on_error not in _ON_ERROR:
+            raise ValueError('on_error should be one of %r, got %r' %
+                             (_ON_ERROR, on_error))
+        if self._out is not None:
+            raise RuntimeError('pipeline is already running')
+
+        self.stages.append(_stage(fn, size, cb, ctx, maxsize or size,
+            on_error, name or getattr(fn, '__name__', str(len(self.stages))),
+            pool, kwargs))
+        return self
+
+    def run(self, iterable):
+        '''Starts pipeline for sync or async `iterable`, returns async
+        iterator of results of the last stage. Can be called once.'''
+        if not self.stages:
+            raise RuntimeError('pipeline has no stages')
+        if self._out is not None:
+            raise RuntimeError('pipeline is already running')
+
+        loop = aio.get_event_loop()
+        self._started = time.monotonic()
+        source, passing = iterable, False
+        for i, stage in enumerate(self.stages):
+            if stage.pool is None:
+                stage.pool, stage.owned = AioPool(stage.size), True
+            stage.out = aio.Queue(stage.maxsize)
+            last = i == len(self.stages) - 1
+            self._tasks.append(loop.create_task(
+                self._run_stage(stage, source, last, passing)))
+            source = _drain(stage.out)
+            passing = passing or self.ordered and stage.on_error == 'yield'
+        self._out = self.stages[-1].out
+        return self
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        if self._out is None:
+            raise RuntimeError('pipeline is not running, see `run`')
+        res = await self._out.get()
+        if res is _DONE:
+            await self.aclose()
+            raise StopAsyncIteration()
+        if isinstance(res, _failure):
+            await self.aclose()
+            raise res.exc
+        return res
+
+    async def _run_stage(self, stage, source, last, passing=False):
+        # items in flight are cancelled by `map_into`, when stage task is
+        # cancelled or it's output raises. If `passing`, items may be
+        # `_passed` failures of previous stages, which keep their place
+        async def deliver(pair):
+            res, exc = pair
+            if isinstance(res, _passed):
+                await stage.out.put(res.exc if last else res)
+                return
+            stage.done += 1
+            if exc is not None:
+                stage.errors += 1
+                if stage.on_error == 'raise':
+                    raise _crashed(exc)
+                if stage.on_error == 'skip':
+                    return
+                res = exc
+                if not last:
+                    if not self.ordered:  # right to the output
+                        await self._out.put(res)
+                        return
+                    res = _passed(exc)
+            await stage.out.put(res)
+
+        fn, cb, kwargs = stage.fn, stage.cb, stage.kwargs
+        if passing:
+            fn, cb, kwargs = _passing(stage.pool, fn, cb, kwargs)
+        try:
+            await stage.pool.map_into(fn, source, deliver, cb, stage.ctx,
+                get_result=getres.pair, ordered=self.ordered, **kwargs)
+            await stage.out.put(_DONE)
+        except _crashed as e:
+            await self._fail(e.exc)
+        except aio.CancelledError:
+            raise
+        except BaseException as exc:
+            await self._fail(exc)
+
+    async def _fail(self, exc):
+        # cancels stages, passes `exc` to whoever iterates pipeline
+        if self._error is not None:
+            return
+        self._error = exc
+        for task in self._tasks:
+            if task is not _current_task():
+                task.cancel()
+
+        out = self._out
+        while not out.empty():
+            out.get_nowait()
+        out.put_nowait(_failure(exc))
+
+    async def aclose(self):
+        '''Cancels stages and items of pipeline still running, shuts down
+        pools created by pipeline. Pools passed to stages may be running
+        something else, so nothing but pipeline's items is cancelled there.
+        '''
+        tasks, self._tasks = self._tasks, []
+        if self._error is None:  # otherwise `_fail` cancelled them already
+            for task in tasks:
+                task.cancel()
+        if tasks:
+            await aio.wait(tasks)  # they cancel their items
+        for stage in self.stages:
+            if stage.owned:
+                if not stage.pool.is_empty:
+                    await stage.pool.cancel()
+                await stage.pool._shutdown()
+
+    def stats(self):
+        '''Returns list of dicts with stats of stages: `name`, pool `size`,
+        number of `active` items, `queue` -- number of results waiting for
+        the next stage (`maxsize` at most), number of `done` items (including
+        crashed), `errors` and `throughput` -- done items per second since
+        `run`. The slowest stage usually has full queue before it and empty
+        one after it.'''
+        elapsed = time.monotonic() - self._started if self._started else 0
+        return [{
+            'name': stage.name,
+            'size': stage.pool.size if stage.pool is not None else stage.size,
+            'active': stage.pool.n_active if stage.pool is not None else 0,
+            'queue': stage.out.qsize() if stage.out is not None else 0,
+            'maxsize': stage.maxsize,
+            'done': stage.done,
+            'errors': stage.errors,
+            'throughput': stage.done / elapsed if elapsed > 0 else 0.0,
+        } for stage in self.stages]
+
+
+class _stage(object):
+
+    def __init__(self, fn, size, cb, ctx, maxsize, on_error, name, pool,
+            kwargs):
+        self.fn, self.size, self.cb, self.ctx = fn, size, cb, ctx
+        self.maxsize, self.on_error, self.name = maxsize, on_error, name
+        self.pool, self.owned, self.kwargs = pool, False, kwargs
+        self.out = None
+        self.done = self.errors = 0
+
+
+class _failure(object):
+    # exception of crashed pipeline, passed to it's output
+    def __init__(self, exc):
+        self.exc = exc
+
+
+class _passed(object):
+    # exception of "yield" stage, passed through the next ones in order
+    def __init__(self, exc):
+        self.exc = exc
+
+
+def _passing(pool, fn, cb, kwargs):
+    # wraps `fn`, `cb` and `key` of stage, so `_passed` items go through
+    # them untouched
+    kwargs = dict(kwargs)
+    fn = pool._sync_fn(fn, kwargs.pop('executor', None))
+    key = kwargs.get('key')
+    if key is not None:
+        kwargs['key'] = lambda it: None if isinstance(it, _passed) else \
+            key(it)
+
+    async def _fn(it):
+        if isinstance(it, _passed):
+            return it
+        return await fn(it)
+
+    async def _fn_batched(items):
+        todo = [it for it in items if not isinstance(it, _passed)]
+        if len(todo) == len(items):
+            return await fn(items)
+        res = await fn(todo) if todo else []
+        if not isinstance(res, (list, tuple)) or len(res) != len(todo):
+            raise ValueError('batched fn should return a list of %d '
+                             'results' % (len(todo),))
+        res = iter(res)
+        return [it if isinstance(it, _passed) else next(res) for it in items]
+
+    if cb is not None:
+        cb = _resolve_cb(cb)
+
+        async def _cb(res, err=None, ctx=None):
+            if isinstance(res, _passed):
+                return res
+            return await cb(res, err, ctx)
+
+    return (_fn_batched if kwargs.get('batched') else _fn,
+            cb and _cb, kwargs)
+
+
+class _crashed(Exception):
+    # raised by stage output with "raise" `on_error`, so `map_into` cancels
+    # items in flight
+    def __init__(self, exc):
+        self.exc = exc
+
+
+class _drain(object):
+    # async iterator over items of stage output queue
+
+    def __init__(self, queue):
+        self.queue = queue
+        self.done = False
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        # keeps raising once exhausted, chunks of the next stage may ask
+        # for more after the last, incomplete one
+        if self.done:
+            raise StopAsyncIteration()
+        item = await self.queue.get()
+        if item is _DONE:
+            self.done = True
+            raise StopAsyncIteration()
+        return item
@@ -0,0 +1,79 @@
+'''Token bucket rate limiter for pools'''
+
+import time
+import asyncio as aio
+
+
+class RateLimit(object):
+
+    def __init__(self, rate, burst=1, *, per_key=False):
+        '''Token bucket, allowing `rate` acquisitions per second on average
+        and up to `burst` acquisitions at once. If `per_key` is True, every
+        key, passed to `acquire`, has it's own bucket.
+
+        Pass it to pool as `rate_limit` and pool will take a token for every
+        spawned coroutine before it gets pool space: coroutines, whose tokens
+        are not there yet, wait aside, so they don't hold pool space (and
+        don't stall other keys). Same `RateLimit` can be shared by several
+        pools.
+
+        No tasks or timers are created per token: every acquisition reserves
+        the earliest free token (GCRA, "virtual scheduling" algorithm) and
+        sleeps until it's time, so concurrent acquisitions are spread evenly
+        and allowed rate is saturated exactly.
+        '''
+        if rate <= 0 or burst < 1:
+            raise ValueError('rate should be positive, burst at least 1')
+
+        self.rate = rate
+        self.burst = burst
+        self.per_key = per_key
+        self._interval = 1 / rate
+        self._tolerance = (burst - 1) * self._interval
+        self._tats = {}  # key -> theoretical arrival time of next token
+        self._prune_at = 1024
+
+    def reserve(self, key=None):
+        '''Takes a token, returns delay (in seconds) to wait before using
+        it.'''
+        key = key if self.per_key else None
+        now = time.monotonic()
+
+        if len(self._tats) > self._prune_at:
+            self._prune(now)
+
+        tat = max(self._tats.get(key, now), now)
+        self._tats[key] = tat + self._interval
+        return max(tat - self._tolerance - now, 0)
+
+    def _take(self, key=None):
+        # takes a token only if it's there already, returns 0 then, or delay
+        # until it's there otherwise
+        delay = self.reserve(key)
+        if delay > 0:
+            self._refund(key)
+        return delay
+
+    def _bucket(self, key=None):
+        return key if self.per_key else None
+
+    def _refund(self, key=None):
+        key = key if self.per_key else None
+        if key in self._tats:
+            self._tats[key] -= self._interval
+
+    def _prune(self, now):
+        # buckets which are full again are the same as missing ones
+        for key in [k for k, tat in self._tats.items() if tat <= now]:
+            del self._tats[key]
+        self._prune_at = max(1024, 2 * len(self._tats))
+
+    async def acquire(self, key=None):
+        '''Waits for a token in bucket of `key`.'''
+        delay = self.reserve(key)
+        if delay > 0:
+            try:
+                await aio.sleep(delay)
+            except BaseException:
+                self._refund(key)  # token was not used
+                raise
@@ -0,0 +1,47 @@
+'''Retry policy for pooled coroutines'''
+
+import random
+import asyncio as aio
+
+
+class Retry(object):
+
+    def __init__(self, attempts=3, *, on=Exception, backoff=0.1, factor=2,
+            max_backoff=10, jitter=True):
+        '''Retry policy, pass it to spawning methods as `retry`. Crashed
+        coroutine is created again and re-spawned up to `attempts` times in
+        total, if it's exception matches `on` -- exception class, tuple of
+        them or a function, accepting exception and returning bool.
+        Cancelled coroutines are never retried.
+
+        Before attempt N+1 pool waits `backoff` * `factor` ** (N - 1) seconds,
+        but no more than `max_backoff`. With `jitter` actual delay is random,
+        from zero up to that value ("full jitter"), so crashed coroutines don't
+        come back all at once. Coroutine does not occupy pool space while
+        waiting.
+        '''
+        if attempts < 1:
+            raise ValueError('attempts should be at least 1')
+
+        self.attempts = attempts
+        self.on = on
+        self.backoff = backoff
+        self.factor = factor
+        self.max_backoff = max_backoff
+        self.jitter = jitter
+
+    def retries(self, exc, attempt):
+        '''Returns True if coroutine, crashed with `exc` on `attempt`
+        (counting from 1), should be retried.'''
+
+        if attempt >= self.attempts or isinstance(exc, aio.CancelledError):
+            return False
+        if isinstance(self.on, (type, tuple)):
+            return isinstance(exc, self.on)
+        return bool(self.on(exc))
+
+    def delay(self, attempt):
+        '''Returns delay (in seconds) before attempt `attempt` + 1.'''
+        delay = min(self.max_backoff,
+                    self.backoff * self.factor ** (attempt - 1))
+        return random.uniform(0, delay) if self.jitter else delay
@@ -0,0 +1,306 @@
+'''Pool, sharded across processes, each with it's own event loop and pool'''
+
+import os
+import pickle
+import asyncio as aio
+import multiprocessing as mp
+from collections import deque
+from functools import partial
+from itertools import count
+from concurrent.futures import ThreadPoolExecutor
+from .results import getres
+from .base_pool import _iter_next, _get_loop, _window
+
+
+class ShardedPool(object):
+
+    def __init__(self, shards=None, size=1024, *, prefetch=None, batch=64,
+            pool_cls=None, context=None, **pool_kwargs):
+        '''Front-end for `shards` (default is number of cores) worker
+        processes, each running it's own event loop and pool (`pool_cls`,
+        `AioPool` by default, created with `pool_kwargs`), so scheduling
+        overhead is spread across cores. `size` is total concurrency budget,
+        split evenly across shards.
+
+        Items of `map` and `itermap` are sent to shards in batches of up to
+        `batch` items, round robin or by hash of their `key`, results are
+        streamed back as soon as they are done. No more than `size` +
+        `prefetch` (default is `size`) items are in flight, so shards always
+        have next items at hand, but `iterable` is not consumed as a whole.
+
+        `fn`, items, results and exceptions cross process boundaries, so
+        they should be picklable, `fn` is usually a module-level coroutine
+        function. Processes are started with multiprocessing `context`
+        ("fork", "spawn" and so on, or platform default).
+
+        Use it as async context manager, or call `start` and `close`.
+        '''
+        self.n_shards = shards or os.cpu_count() or 1
+        self.size = size
+        self.prefetch = size if prefetch is None else prefetch
+        self.batch = batch
+        self.pool_cls = pool_cls
+        self.context = context
+        self.pool_kwargs = pool_kwargs
+        self.loop = None
+        self._shards = []
+        self._readers = []
+        self._io = None  # threads, sending and receiving data of shards
+        self._futures = {}  # item id -> future
+        self._ids = count()
+        self._rr = count()  # round robin
+
+    async def __aenter__(self):
+        await self.start()
+        return self
+
+    async def __aexit__(self, ext_type, exc, tb):
+        await self.close()
+
+    def __len__(self):
+        return len(self._futures)
+
+    async def start(self):
+        '''Starts shard processes.'''
+        if self._shards:
+            return
+
+        self.loop = _get_loop()
+        ctx = mp.get_context(self.context)
+        for i in range(self.n_shards):
+            size = self.size // self.n_shards + (i < self.size % self.n_shards)
+            items_r, items_w = ctx.Pipe(duplex=False)
+            results_r, results_w = ctx.Pipe(duplex=False)
+            process = ctx.Process(target=_shard_main, daemon=True, args=(
+                items_r, results_w, max(size, 1), self.pool_cls,
+                self.pool_kwargs))
+            process.start()
+            items_r.close()  # it's process' ends now
+            results_w.close()
+            self._shards.append(_shard(process, items_w, results_r))
+
+        self._io = ThreadPoolExecutor(2 * self.n_shards)
+        self._readers = [self.loop.create_task(self._read(shard))
+                         for shard in self._shards]
+
+    async def close(self):
+        '''Waits for items in flight, stops shard processes.'''
+        shards, self._shards = self._shards, []
+        for shard in shards:
+            try:
+                async with shard.lock:
+                    await self.loop.run_in_executor(
+                        self._io, shard.items.send, None)
+            except OSError:
+                pass  # already dead
+        if self._readers:
+            await aio.wait(self._readers)
+        self._readers = []
+        for shard in shards:
+            await self.loop.run_in_executor(self._io, shard.process.join)
+            shard.items.close()
+            shard.results.close()
+        if self._io is not None:
+            self._io.shutdown()
+            self._io = None
+
+    def _route(self, item, key=None):
+        if key is None:
+            i = next(self._rr)
+        else:
+            i = hash(key(item))
+        return self._shards[i % len(self._shards)]
+
+    async def _send(self, shard, fn, batch):
+        # sends `batch` of (id, item) to `shard`, items of unpicklable batch
+        # get the exception
+        try:
+            async with shard.lock:  # messages should not interleave
+                await self.loop.run_in_executor(
+                    self._io, shard.items.send, (fn, batch))
+        except Exception as e:
+            for id, _ in batch:
+                shard.ids.discard(id)
+                fut = self._futures.pop(id, None)
+                if fut is not None and not fut.done():
+                    fut.set_exception(e)
+
+    async def _read(self, shard):
+        # resolves futures with results from `shard`, until it exits
+        while True:
+            try:
+                results = await self.loop.run_in_executor(
+                    self._io, shard.results.recv)
+            except (EOFError, OSError):
+                break
+            for id, res, exc in results:
+                shard.ids.discard(id)
+                fut = self._futures.pop(id, None)
+                if fut is None or fut.done():
+                    continue
+                if exc is not None:
+                    fut.set_exception(exc)
+                else:
+                    fut.set_result(res)
+
+        for id in shard.ids:  # lost with crashed process
+            fut = self._futures.pop(id, None)
+            if fut is not None and not fut.done():
+                fut.set_exception(RuntimeError(
+                    'shard process exited with code %r' %
+                    (shard.process.exitcode,)))
+        shard.ids.clear()
+
+    async def map(self, fn, iterable, *, key=None, get_result=getres.flat):
+        '''Executes `fn` coroutine function for every item of sync or async
+        `iterable` in shards, waits for all of them, returns results in order
+        of `iterable`. `key` is a function, returning key of item, items with
+        the same key go to the same shard. Read about `get_result` in
+        `AioPool.map` docs.'''
+        iterator = _sharditer(self, fn, iterable, key, False, getres.dont)
+        iterator.all = []
+        async for _ in iterator:
+            pass
+        return [get_result(fut) for fut in iterator.all]
+
+    def itermap(self, fn, iterable, *, key=None, ordered=False,
+            get_result=getres.flat):
+        '''Returns async iterator, executing `fn` coroutine function for
+        every item of sync or async `iterable` in shards, yielding results as
+        they are done, or in order of `iterable` if `ordered` is True. Items
+        are pulled from `iterable` only when there is room for them, see
+        `map` for `key` and `get_result`.'''
+        return _sharditer(self, fn, iterable, key, ordered, get_result)
+
+
+class _shard(object):
+
+    def __init__(self, process, items, results):
+        self.process = process
+        self.items = items  # connection to send items to process
+        self.results = results  # connection to receive results from it
+        self.ids = set()  # ids of items in flight
+        self.lock = aio.Lock()
+
+
+class _sharditer(_window):
+    # async iterator over results of items, sent to shards
+
+    def __init__(self, pool, fn, iterable, key, ordered, get_result):
+        if not pool._shards:
+            raise RuntimeError('pool is not started, see `start`')
+        super().__init__(None, lambda: pool.size + pool.prefetch, ordered,
+                         loop=pool.loop)
+        self.pool = pool
+        self.fn = fn
+        self.key = key
+        self.get_result = get_result
+        self.all = None  # all the futures, if needed
+        self._next = _iter_next(iterable)
+        self._done = deque()
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        while not self._done:
+            await self.fill()
+            if not self.futures:
+                raise StopAsyncIteration()
+            self._done.extend(await self.next_done())
+        return self.get_result(self._done.popleft())
+
+    async def fill(self):
+        # pulls items while there is room for them, sends them in batches
+        pool, push = self.pool, self.push
+        batches, n_pulled = {}, 0
+        while not self.exhausted and len(self.futures) < self.limit() and \
+                n_pulled < pool.batch * pool.n_shards:
+            try:
+                item = await self._next()
+            except StopAsyncIteration:
+                self.exhausted = True
+                break
+            n_pulled += 1
+
+            shard, id = pool._route(item, self.key), next(pool._ids)
+            fut = pool._futures[id] = pool.loop.create_future()
+            shard.ids.add(id)
+            push(fut)
+            if self.all is not None:
+                self.all.append(fut)
+
+            batch = batches.setdefault(shard, [])
+            batch.append((id, item))
+            if len(batch) >= pool.batch:
+                await pool._send(shard, self.fn, batches.pop(shard))
+
+        for shard, batch in batches.items():
+            await pool._send(shard, self.fn, batch)
+
+
+def _shard_main(items, results, size, pool_cls, pool_kwargs):
+    # entry point of shard process
+    loop = aio.new_event_loop()
+    aio.set_event_loop(loop)
+    try:
+        loop.run_until_complete(
+            _serve(items, results, size, pool_cls, pool_kwargs))
+    finally:
+        loop.close()
+
+
+async def _serve(items, results, size, pool_cls, pool_kwargs):
+    # spawns received items in pool, sends back (id, res, exc) of finished
+    # ones in batches, once per loop iteration
+    if pool_cls is None:
+        from . import AioPool as pool_cls
+    loop = _get_loop()
+    out = []
+
+    def flush():
+        if not out:
+            return
+        batch = out[:]
+        del out[:]
+        try:
+            results.send(batch)
+        except Exception:  # some of them can't be pickled
+            results.send([_picklable(*r) for r in batch])
+
+    def done(id, fut):
+        if not out:
+            loop.call_soon(flush)
+        out.append((id,) + getres.pair(fut))
+
+    reader = ThreadPoolExecutor(1)
+    async with pool_cls(size, **pool_kwargs) as pool:
+        while True:
+            msg = await loop.run_in_executor(reader, items.recv)
+            if msg is None:
+                break
+            fn, batch = msg
+            for id, item in batch:
+                try:
+                    coro = fn(item)
+                except Exception as e:
+                    done(id, _failed(loop, e))
+                    continue
+                pool.spawn_n(coro).add_done_callback(partial(done, id))
+    reader.shutdown()
+    flush()
+
+
+def _failed(loop, exc):
+    fut = loop.create_future()
+    fut.set_exception(exc)
+    return fut
+
+
+def _picklable(id, res, exc):
+    try:
+        pickle.dumps((res, exc))
+        return id, res, exc
+    except Exception as e:
+        return id, None, RuntimeError('result can not be sent from shard '
+                                      'process: %r' % (e,))
@@ -0,0 +1,173 @@
+'''Pool of asyncio coroutines, executed by long-lived worker tasks'''
+
+import time
+import traceback
+import asyncio as aio
+from collections import deque
+from .base_pool import BaseAioPool, _NOLIMIT, _close
+
+
+class BaseWorkerPool(BaseAioPool):
+
+    def __init__(self, size=1024, *, loop=None, rate_limit=None,
+            controller=None, metrics=None, key_limit=None, fair=False,
+            max_waiting=None, overflow='block'):
+        '''Pool of asyncio coroutines with the same interface as `BaseAioPool`,
+        but with different execution engine.
+
+        `BaseAioPool` creates a task for every started coroutine. Here, no
+        more than `size` long-lived worker tasks pull spawned coroutines from
+        internal queue and execute them (and their callbacks) one by one, so
+        there are no tasks created per coroutine at all. Workers are started
+        on demand and exit when pool is empty (or shrinked with `resize`).
+        '''
+        super().__init__(size, loop=loop, rate_limit=rate_limit,
+                         controller=controller, metrics=metrics,
+                         key_limit=key_limit, fair=fair,
+                         max_waiting=max_waiting, overflow=overflow)
+
+        self._workers = set()
+        self._idle = deque()  # futures of workers waiting for queue items
+        self._cancelling = set()  # futures cancelled while active
+
+    def _admit(self):
+        # wakes idle workers or starts new ones, while there are waiting
+        # coroutines, not claimed by running workers, and pool space for them
+        n_active = len(self._active)
+        n_needed = min(len(self._waiting), self.size - n_active)
+        n_ready = len(self._workers) - n_active - len(self._idle)
+        while n_ready < n_needed:
+            if not self._wake_idle():
+                if len(self._workers) >= self.size:
+                    break
+                worker = self.loop.create_task(self._worker())
+                if not worker.done():  # eager task factory may finish it
+                    self._workers.add(worker)
+            n_ready += 1
+
+    def _wake_idle(self, everyone=False):
+        woken = False
+        while self._idle and (everyone or not woken):
+            idle = self._idle.popleft()
+            if not idle.done():
+                idle.set_result(None)
+                woken = True
+        return woken
+
+    def _release_joined(self):
+        super()._release_joined()
+        self._wake_idle(everyone=True)  # to let them exit
+
+    async def _worker(self):
+        worker = _current_task()
+        self._workers.add(worker)  # before `_admit` does, if eager
+        try:
+            while self._queue or self._heap or not self.is_empty:
+                if len(self._workers) > self.size:
+                    break  # pool was shrinked
+
+                if not (self._queue or self._heap) or \
+                        len(self._active) >= self.size:
+                    idle = self.loop.create_future()  # wait for queue items
+                    self._idle.append(idle)  # or pool space
+                    await idle
+                    continue
+
+                entry = self._pop()
+                if entry is None:
+                    continue  # keys of everyone left are at their caps
+                future, coro, cb, ctx, key, _, _, retry = entry
+                if future not in self._waiting:
+                    continue  # cancelled while waiting
+                if future.done():  # cancelled outside of pool
+                    self._drop(future)
+                    continue
+                self._take(entry)
+
+                self._active[future] = worker
+                self._enter(future)
+                try:
+                    await self._run(coro, future, cb=cb, ctx=ctx, key=key,
+                                    retry=retry)
+                finally:
+                    del self._active[future]
+                    if self._keyed:
+                        self._release_key(future)
+                    if self._room:
+                        self._wake_room()
+                    if future in self._cancelling:
+                        self._cancelling.remove(future)
+                        _uncancel(worker)
+
+                if self.is_empty:
+                    self._release_joined()
+        finally:
+            self._workers.discard(worker)
+            if self._queue or self._heap:
+                self._admit()  # it could be woken for them, pass it on
+
+    async def _run(self, coro, future, cb=None, ctx=None, key=_NOLIMIT,
+            retry=None, callback=False):
+        res, exc, tb = None, None, None
+        started = time.monotonic()
+        try:
+            res = await coro
+        except BaseException as _exc:
+            _close(coro)  # in case it was not started
+            exc = _exc
+            tb = traceback.format_exc()
+            if isinstance(exc, aio.CancelledError):
+                if future not in self._cancelling:  # worker itself cancelled
+                    future.cancel()
+                    raise
+                exc = self._timeout_error(future, exc)
+        finally:
+            self._executed += 1
+            if not callback:
+                if self._deadlines:
+                    self._clear_deadline(future)
+                if self._timed_out:
+                    self._timed_out.discard(future)
+
+        self._observe(started, exc, callback)
+
+        if exc is not None and retry is not None and \
+                self._retry(future, exc, cb, ctx, key, retry):
+            return  # worker is free until retry
+
+        while cb:
+            err = None if exc is None else (exc, tb)
+
+            _cb, _cb_err = self._build_callback(cb, res, err, ctx)
+            if _cb_err is not None:
+                exc = _cb_err  # pass to future
+                break
+
+            # same worker, no new tasks
+            return await self._run(_cb, future, callback=True)
+
+        if not future.done():
+            if exc:
+                future.set_exception(exc)
+            else:
+                future.set_result(res)
+
+    def _cancel_active(self, future):
+        self._cancelling.add(future)
+        return self._active[future].cancel()
+
+
+def _current_task():
+    """
+    Backward compatibility w/ py<3.7
+    """
+
+    if hasattr(aio, 'current_task'):
+        return aio.current_task()
+    return aio.Task.current_task()
+
+
+def _uncancel(task):
+    # py3.11+ counts cancellation requests, worker survives this one
+    if hasattr(task, 'uncancel'):
+        task.uncancel()
@@ -6,6 +6,7 @@ sys.path.insert(0, os.path.split(curr_dir)[0])
 import logging
 import asyncio as aio
 import json as myformat   # just for a demo
+from asyncio_pool import AioPool, Group
 
 
 def parse_res(res):
@@ -19,12 +20,14 @@ async def ls_cb(res, err, ctx):
         log.error()
         return
 
+    # callback runs in the same group as `api.ls`, so spawned coroutines
+    # are tracked too, waiting for pool space here could deadlock pool
     files, folders = parse_res(res)
     for folder in folders:
-        await apipool.spawn(api.ls(folder['path']), cb=ls_cb, ctx=ctx)
-        await dbpool.spawn(db.save(folder))
+        apipool.spawn_n(api.ls(folder['path']), cb=ls_cb, ctx=ctx)
+        dbpool.spawn_n(db.save(folder))
     for file in files:
-        await dbpool.spawn(db.save(file))
+        dbpool.spawn_n(db.save(file))
 
 
 async def example_ls():
@@ -33,10 +36,11 @@ async def example_ls():
     db = await create_connection(dsn, loop)
     log = logging.getLogger('example_ls')
 
-    with AioPool(size=10) as dbpool, \
+    async with AioPool(size=10) as dbpool, \
             AioPool(size=10) as apipool:
         ctx = (apipool, dbpool, api, db, log)
-        await apipool.spawn(api.ls('/'), cb=ls_cb, ctx=ctx)
+        async with Group():  # exits when the whole tree is listed and saved
+            await apipool.spawn(api.ls('/'), cb=ls_cb, ctx=ctx)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,352 @@
+import os
+import sys
+curr_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.split(curr_dir)[0])
+
+import gc
+import json
+import math
+import time
+import argparse
+import platform
+import itertools
+import subprocess
+import tracemalloc
+import asyncio as aio
+from functools import partial
+from asyncio_pool import AioPool, AioWorkerPool
+
+try:
+    import uvloop
+except ImportError:
+    uvloop = None
+
+
+# Every scenario is `async def(pool_cls, tasks, pool_size, duration)`, it
+# runs `tasks` coroutines, each sleeping `duration` seconds, and returns
+# "ideal" execution time -- what it would take with no overhead at all.
+
+def _ideal(tasks, pool_size, duration):
+    return math.ceil(tasks / pool_size) * duration
+
+
+async def bench_spawn(pool_cls, tasks, pool_size, duration):
+    async with pool_cls(size=pool_size) as pool:
+        for _ in range(tasks):
+            await pool.spawn(aio.sleep(duration))
+    return _ideal(tasks, pool_size, duration)
+
+
+async def bench_spawn_n(pool_cls, tasks, pool_size, duration):
+    async with pool_cls(size=pool_size) as pool:
+        for _ in range(tasks):
+            pool.spawn_n(aio.sleep(duration))
+    return _ideal(tasks, pool_size, duration)
+
+
+async def bench_exec(pool_cls, tasks, pool_size, duration):
+    # `exec` waits for result, so `pool_size` clients are calling it
+    async def client(n):
+        for _ in range(n):
+            await pool.exec(aio.sleep(duration))
+
+    async with pool_cls(size=pool_size) as pool:
+        per_client, rest = divmod(tasks, pool_size)
+        await aio.gather(*(client(per_client + (i < rest))
+                           for i in range(pool_size)))
+    return _ideal(tasks, pool_size, duration)
+
+
+async def bench_map(pool_cls, tasks, pool_size, duration):
+    async def wrk(i):
+        await aio.sleep(duration)
+
+    async with pool_cls(size=pool_size) as pool:
+        await pool.map(wrk, range(tasks))
+    return _ideal(tasks, pool_size, duration)
+
+
+def _itermap(flat, yield_when):
+    async def bench_itermap(pool_cls, tasks, pool_size, duration):
+        async def wrk(i):
+            await aio.sleep(duration)
+
+        async with pool_cls(size=pool_size) as pool:
+            async for _ in pool.itermap(wrk, range(tasks), flat=flat,
+                                        yield_when=yield_when):
+                pass
+        return _ideal(tasks, pool_size, duration)
+    return bench_itermap
+
+
+async def bench_callbacks(pool_cls, tasks, pool_size, duration):
+    results = []
+
+    async def cb(res, err, ctx):
+        results.append(ctx)
+
+    async with pool_cls(size=pool_size) as pool:
+        for i in range(tasks):
+            pool.spawn_n(aio.sleep(duration), cb, i)
+    assert len(results) == tasks
+    return _ideal(tasks, pool_size, duration)
+
+
+async def bench_instant(pool_cls, tasks, pool_size, duration):
+    # coroutines, done without suspension (cache hits and so on), which is
+    # where eager tasks shine
+    async def wrk(i):
+        return i
+
+    async with pool_cls(size=pool_size) as pool:
+        await pool.map(wrk, range(tasks))
+    return 0.0
+
+
+async def bench_cancel(pool_cls, tasks, pool_size, duration):
+    # queues everything, lets the first `pool_size` start, cancels all
+    async with pool_cls(size=pool_size) as pool:
+        for _ in range(tasks):
+            pool.spawn_n(aio.sleep(duration + 3600))
+        await aio.sleep(0)
+        await pool.cancel()
+    return 0.0
+
+
+SCENARIOS = {
+    'spawn': bench_spawn,
+    'spawn_n': bench_spawn_n,
+    'exec': bench_exec,
+    'map': bench_map,
+    'itermap': _itermap(True, aio.ALL_COMPLETED),
+    'itermap_first': _itermap(True, aio.FIRST_COMPLETED),
+    'itermap_exception': _itermap(True, aio.FIRST_EXCEPTION),
+    'itermap_batch': _itermap(False, aio.ALL_COMPLETED),
+    'itermap_batch_first': _itermap(False, aio.FIRST_COMPLETED),
+    'itermap_batch_exception': _itermap(False, aio.FIRST_EXCEPTION),
+    'callbacks': bench_callbacks,
+    'instant': bench_instant,
+    'cancel': bench_cancel,
+}
+
+EAGER = hasattr(aio, 'eager_task_factory')  # python3.12+
+
+ENGINES = {
+    'tasks': AioPool,
+    'workers': AioWorkerPool,
+}
+if EAGER:  # pooled coroutines start eagerly, other tasks don't
+    ENGINES['eager'] = partial(AioPool, eager=True)
+
+
+def _eager_loop(new_loop=aio.new_event_loop):
+    # every task of the loop starts eagerly
+    loop = new_loop()
+    loop.set_task_factory(aio.eager_task_factory)
+    return loop
+
+
+LOOPS = {
+    'asyncio': aio.new_event_loop,
+}
+if EAGER:
+    LOOPS['asyncio_eager'] = _eager_loop
+if uvloop is not None:
+    LOOPS['uvloop'] = uvloop.new_event_loop
+    if EAGER:
+        LOOPS['uvloop_eager'] = partial(_eager_loop, uvloop.new_event_loop)
+
+# compared by `compare`, all of them are "lower is better"
+METRICS = ('overhead_per_task', 'cpu_per_task', 'peak_memory')
+
+
+def _run(loop_name, coro):
+    loop = LOOPS[loop_name]()
+    aio.set_event_loop(loop)
+    try:
+        return loop.run_until_complete(coro)
+    finally:
+        aio.set_event_loop(None)
+        loop.close()
+
+
+def run_one(scenario, engine, loop_name, tasks, pool_size, duration,
+        memory=True, repeat=1):
+    '''Runs scenario `repeat` times, returns dict of it's parameters and
+    the best measurements: wall clock time, overhead over ideal time, CPU
+    time of process (it's event loop, basically) and, if `memory` is True,
+    peak of traced memory in a separate run, because tracing slows
+    everything down.'''
+    bench = SCENARIOS[scenario]
+    args = (ENGINES[engine], tasks, pool_size, duration)
+
+    wall = cpu = float('inf')
+    for _ in range(repeat):
+        gc.collect()
+        wall_start, cpu_start = time.perf_counter(), time.process_time()
+        ideal = _run(loop_name, bench(*args))
+        wall = min(wall, time.perf_counter() - wall_start)
+        cpu = min(cpu, time.process_time() - cpu_start)
+
+    peak = None
+    if memory:
+        gc.collect()
+        tracemalloc.start()
+        try:
+            _run(loop_name, bench(*args))
+            peak = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+
+    overhead = max(wall - ideal, 0.0)
+    return {
+        'scenario': scenario, 'engine': engine, 'loop': loop_name,
+        'tasks': tasks, 'pool_size': pool_size, 'duration': duration,
+        'ideal': ideal, 'wall': wall, 'cpu': cpu, 'overhead': overhead,
+        'overhead_per_task': overhead / tasks, 'cpu_per_task': cpu / tasks,
+        'peak_memory': peak,
+    }
+
+
+def _commit():
+    try:
+        return subprocess.check_output(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=curr_dir,
+            stderr=subprocess.DEVNULL).decode().strip()
+    except Exception:
+        return None
+
+
+def run_all(args):
+    results = []
+    for scenario, engine, loop_name, tasks, pool_size in itertools.product(
+            args.scenario, args.engine, args.loop, args.tasks,
+            args.pool_size):
+        res = run_one(scenario, engine, loop_name, tasks, pool_size,
+                      args.task_duration, memory=not args.no_memory,
+                      repeat=args.repeat)
+        results.append(res)
+        print_result(res)
+    return {
+        'meta': {
+            'commit': _commit(),
+            'python': platform.python_version(),
+            'implementation': platform.python_implementation(),
+            'platform': platform.platform(),
+            'uvloop': uvloop.__version__ if uvloop is not None else None,
+        },
+        'results': results,
+    }
+
+
+def _key(res):
+    return tuple(res[k] for k in ('scenario', 'engine', 'loop', 'tasks',
+                                  'pool_size', 'duration'))
+
+
+def _name(res):
+    return '%s/%s/%s tasks=%d size=%d' % (res['scenario'], res['engine'],
+        res['loop'], res['tasks'], res['pool_size'])
+
+
+def print_result(res):
+    peak = res['peak_memory']
+    peak = f' {peak / 2**20:9.2f}MB peak' if peak is not None else ''
+    print(f'{_name(res):56} {res["wall"]:9.4f}s wall '
+          f'{res["overhead_per_task"] * 1e6:9.2f}us/task overhead '
+          f'{res["cpu_per_task"] * 1e6:9.2f}us/task cpu{peak}')
+
+
+def compare(old, new, threshold):
+    '''Compares results of runs with the same parameters, prints relative
+    change of `METRICS`, returns list of regressions -- metrics which are
+    more than `threshold` (0.1 is 10%) worse.'''
+    old_results = {_key(res): res for res in old['results']}
+    regressions, n_compared = [], 0
+    print(f'>>> {old["meta"].get("commit")} -> {new["meta"].get("commit")}')
+    for res in new['results']:
+        base = old_results.get(_key(res))
+        if base is None:
+            continue
+        n_compared += 1
+        changes = []
+        for metric in METRICS:
+            a, b = base.get(metric), res.get(metric)
+            if not a or b is None:
+                continue
+            change = b / a - 1
+            flag = ''
+            if change > threshold:
+                flag = ' !!!'
+                regressions.append((_name(res), metric, change))
+            changes.append(f'{metric} {change * 100:+7.1f}%{flag}')
+        print(f'{_name(res):56} ' + ', '.join(changes))
+    if not n_compared:
+        print('no results with the same parameters')
+    return regressions
+
+
+def _load(path):
+    with open(path) as f:
+        return json.load(f)
+
+
+if __name__ == "__main__":
+    p = argparse.ArgumentParser(description='Benchmarks of pool engines.')
+    sub = p.add_subparsers(dest='command')
+
+    r = sub.add_parser('run', help='run benchmarks')
+    r.add_argument('scenario', nargs='*', help='scenarios to run, all by '
+                   'default: %s' % ', '.join(SCENARIOS))
+    r.add_argument('--tasks', '-t', type=int, nargs='+', default=[10**4])
+    r.add_argument('--pool-size', '-p', type=int, nargs='+',
+                   default=[100, 1000])
+    r.add_argument('--task-duration', '-d', type=float, default=0.01)
+    r.add_argument('--engine', '-e', choices=list(ENGINES), nargs='+',
+                   default=list(ENGINES))
+    r.add_argument('--loop', '-l', choices=list(LOOPS), nargs='+',
+                   default=list(LOOPS))
+    r.add_argument('--repeat', '-r', type=int, default=1,
+                   help='run every benchmark REPEAT times, keep the best')
+    r.add_argument('--no-memory', action='store_true',
+                   help='skip peak memory measurement, which takes a '
+                        'separate traced run')
+    r.add_argument('--json', '-o', metavar='FILE',
+                   help='write results to FILE')
+    r.add_argument('--compare', '-c', metavar='FILE',
+                   help='compare with results of previous run')
+    r.add_argument('--threshold', type=float, default=0.1)
+
+    c = sub.add_parser('compare', help='compare results of two runs')
+    c.add_argument('old')
+    c.add_argument('new')
+    c.add_argument('--threshold', type=float, default=0.1,
+                   help='relative change counted as regression, '
+                        'default is 0.1 (10%%)')
+
+    args = p.parse_args()
+    if args.command == 'compare':
+        old, new = _load(args.old), _load(args.new)
+    elif args.command == 'run':
+        args.scenario = args.scenario or list(SCENARIOS)
+        unknown = set(args.scenario) - set(SCENARIOS)
+        if unknown:
+            r.error('unknown scenarios: %s' % ', '.join(sorted(unknown)))
+        print('>>> Each task takes %.3f sec, loops: %s' %
+              (args.task_duration, ', '.join(args.loop)))
+        old = _load(args.compare) if args.compare else None
+        new = run_all(args)
+        if args.json:
+            with open(args.json, 'w') as f:
+                json.dump(new, f, indent=2)
+    else:
+        p.print_help()
+        sys.exit(2)
+
+    if old is not None:
+        print()
+        regressions = compare(old, new, args.threshold)
+        if regressions:
+            print('\n>>> %d regressions over %.0f%%' %
+                  (len(regressions), args.threshold * 100))
+            sys.exit(1)
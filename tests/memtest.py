@@ -0,0 +1,95 @@
+import os
+import sys
+curr_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.split(curr_dir)[0])
+
+import gc
+import argparse
+import tracemalloc
+import asyncio as aio
+from asyncio_pool import AioPool, AioWorkerPool
+
+
+POOL_DIR = os.path.join(os.path.split(curr_dir)[0], 'asyncio_pool')
+
+
+async def wrk(i):
+    await aio.sleep(0)
+
+
+async def memtest_spawn_n(pool, tasks):
+    return [pool.spawn_n(wrk(i)) for i in range(tasks)]
+
+
+async def memtest_map_n(pool, tasks):
+    return pool.map_n(wrk, range(tasks))
+
+
+async def memtest_retry(pool, tasks):
+    from asyncio_pool import Retry
+    policy = Retry(attempts=2)
+    return pool.map_n(wrk, range(tasks), retry=policy)
+
+
+async def measure(method, pool_cls, tasks):
+    # queues `tasks` items in pool of size 1 (so all of them are waiting),
+    # returns traced memory by source line
+    pool = pool_cls(size=1)
+    await pool.spawn(aio.sleep(0))  # starts workers and whatever is lazy
+    await pool.join()
+
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    futures = await method(pool, tasks)
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+
+    stats = after.compare_to(before, 'lineno')
+    await pool.cancel()
+    await pool.join()
+    del futures
+    return stats
+
+
+def print_stats(stats, tasks, top):
+    total = sum(stat.size_diff for stat in stats)
+    for stat in stats[:top]:
+        frame = stat.traceback[0]
+        filename = os.path.relpath(frame.filename, os.path.dirname(POOL_DIR)) \
+            if frame.filename.startswith(POOL_DIR) else \
+            os.path.basename(frame.filename)
+        print(f'{stat.size_diff / tasks:12.1f}B -- {filename}:{frame.lineno}')
+    print(f'{total / tasks:12.1f}B -- per item, total')
+
+
+if __name__ == "__main__":
+    methods = {
+        'spawn_n': memtest_spawn_n,
+        'map_n': memtest_map_n,
+        'retry': memtest_retry,
+    }
+
+    engines = {
+        'tasks': AioPool,
+        'workers': AioWorkerPool,
+    }
+
+    p = argparse.ArgumentParser(
+        description='Traced memory per queued (not yet started) item, '
+        'by source line it was allocated at.')
+    p.add_argument('method', choices=methods.keys())
+    p.add_argument('--tasks', '-t', type=int, default=10**5)
+    p.add_argument('--engine', '-e', choices=engines.keys(), nargs='+',
+                   default=list(engines.keys()))
+    p.add_argument('--top', type=int, default=8)
+    args = p.parse_args()
+
+    print('>>> Queueing %d items in pool of size=1' % args.tasks)
+    for engine in args.engine:
+        print('\n>>> %s engine:' % engine)
+        loop = aio.new_event_loop()
+        stats = loop.run_until_complete(
+            measure(methods[args.method], engines[engine], args.tasks))
+        loop.close()
+        print_stats(stats, args.tasks, args.top)
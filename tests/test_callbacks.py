@@ -1,6 +1,7 @@
 import pytest
 import asyncio as aio
 from asyncio_pool import AioPool, getres
+from asyncio_pool.worker_pool import _current_task
 
 
 async def cb(res, err, ctx):
@@ -181,6 +182,64 @@ async def test_callback_types():
             tb.startswith('Traceback (most recent call last)')
 
 
+@pytest.mark.parametrize('inline', [False, True])
+@pytest.mark.asyncio
+async def test_callback_signatures(inline):
+    from functools import partial
+
+    async def cb_args(*args):
+        return args
+
+    async def cb_partial(tag, res, err):
+        return tag, res, err
+
+    class CbCall:
+        async def __call__(self, res):
+            return res
+
+    async def wrk(n):
+        await aio.sleep(0)
+        return n
+
+    async with AioPool(size=2, inline_callbacks=inline) as pool:
+        assert (1, None, 'ctx') == await pool.exec(wrk(1), cb_args, 'ctx')
+        assert ('t', 1, None) == \
+            await pool.exec(wrk(1), partial(cb_partial, 't'))
+        assert 1 == await pool.exec(wrk(1), CbCall())
+        assert [2, 4, 6] == await pool.map(wrk, [1, 2, 3],
+            lambda res: wrk(res * 2))
+
+        with pytest.raises(RuntimeError):
+            await pool.exec(wrk(1), partial(cb_partial, 't', 1, None))
+
+
+@pytest.mark.asyncio
+async def test_inline_callbacks():
+    tasks = set()
+
+    async def cb(res):
+        tasks.add(_current_task())
+        await aio.sleep(0.01)
+        return res * 2
+
+    async def wrk(n):
+        tasks.add(_current_task())
+        await aio.sleep(0)
+        return n
+
+    async with AioPool(size=2, inline_callbacks=True) as pool:
+        assert 2 == await pool.exec(wrk(1), cb)
+        assert len(tasks) == 1  # coroutine and callback share a task
+
+        fut = await pool.spawn(wrk(1), cb)
+        await aio.sleep(0.005)  # callback is running
+        assert pool.n_active == 1
+        await pool.cancel(fut)
+        assert fut.cancelled() or \
+            isinstance(fut.exception(), aio.CancelledError)
+        assert pool.is_empty
+
+
 def inspect(obj):
     names = dir(obj)
     pad = len(max(names, key=lambda n: len(n)))
@@ -0,0 +1,87 @@
+import pytest
+import asyncio as aio
+from functools import partial
+from asyncio_pool import AioPool, AioWorkerPool, getres
+
+
+EAGER = hasattr(aio, 'eager_task_factory')
+needs_eager = pytest.mark.skipif(not EAGER, reason='python3.12+ only')
+
+
+class Counter:
+    # tracks max number of concurrent coroutines
+    def __init__(self):
+        self.active = self.max = 0
+
+    async def wrk(self, i, sleep=None):
+        self.active += 1
+        self.max = max(self.max, self.active)
+        if sleep is not None:
+            await aio.sleep(sleep)
+        self.active -= 1
+        return i
+
+
+async def cb(res, err, ctx):
+    if err:
+        return err[0]
+    await aio.sleep(0)
+    return res * 10
+
+
+@pytest.mark.asyncio
+async def test_eager_ignored():
+    pool = AioPool(size=2, eager=True)
+    assert pool.eager is EAGER
+    assert await pool.map(Counter().wrk, range(5)) == list(range(5))
+
+
+@needs_eager
+@pytest.mark.asyncio
+async def test_eager_pool():
+    counter = Counter()
+    async with AioPool(size=10, eager=True) as pool:
+        fut = pool.spawn_n(counter.wrk(1))
+        assert fut.done() and pool.is_empty  # no loop iteration needed
+
+        # no recursion, when every one of them is done right away
+        futures = pool.map_n(counter.wrk, range(10000))
+        assert all(f.done() for f in futures)
+
+        futures = pool.map_n(partial(counter.wrk, sleep=0.001), range(50))
+        assert pool.n_active == 10 and len(pool) == 50
+        await aio.wait(futures)
+        assert counter.max == 10
+
+        assert await pool.map(counter.wrk, range(20), cb) == \
+            [i * 10 for i in range(20)]
+        assert await pool.exec(counter.wrk(3), cb) == 30
+
+
+@needs_eager
+@pytest.mark.parametrize('pool_cls', [AioPool, AioWorkerPool])
+@pytest.mark.asyncio
+async def test_eager_task_factory(pool_cls):
+    loop = aio.get_running_loop()
+    factory = loop.get_task_factory()
+    loop.set_task_factory(aio.eager_task_factory)
+    try:
+        counter = Counter()
+        async with pool_cls(size=5) as pool:
+            assert await pool.map(counter.wrk, range(100)) == \
+                list(range(100))
+            futures = pool.map_n(partial(counter.wrk, sleep=0.001),
+                                 range(30), cb)
+            await aio.wait(futures)
+            assert [getres.flat(f) for f in futures] == \
+                [i * 10 for i in range(30)]
+            assert counter.max <= 5
+
+            futures = pool.map_n(partial(counter.wrk, sleep=1), range(10))
+            await aio.sleep(0)
+            cancelled, _ = await pool.cancel()
+            assert cancelled == 10 and pool.is_empty
+        if pool_cls is AioWorkerPool:
+            assert all(not w.done() for w in pool._workers)
+    finally:
+        loop.set_task_factory(factory)
@@ -0,0 +1,117 @@
+import os
+import time
+import pytest
+import asyncio as aio
+from concurrent.futures import ThreadPoolExecutor
+from asyncio_pool import AioPool, AioWorkerPool, getres
+
+
+def blocking(n):
+    time.sleep(0.1)
+    return 1 / n
+
+
+def whoami(n):
+    return os.getpid()
+
+
+async def cb(res, err, ctx):
+    if err:
+        return err[0]
+    return res * ctx
+
+
+@pytest.mark.parametrize('pool_cls', [AioPool, AioWorkerPool])
+@pytest.mark.asyncio
+async def test_spawn_sync(pool_cls):
+    ticks = 0
+
+    async def ticker():
+        nonlocal ticks
+        while True:
+            ticks += 1
+            await aio.sleep(0.01)
+
+    loop = aio.get_event_loop()
+    tick = loop.create_task(ticker())
+    async with pool_cls(size=4) as pool:
+        futures = [await pool.spawn_sync(blocking, n) for n in (1, 2, 4, 5)]
+        assert pool.n_active == 4 and pool.is_full
+        f_cb = await pool.spawn_sync(blocking, 2, cb=cb, ctx=10)
+        f_err = await pool.spawn_sync(blocking, 0)
+
+    tick.cancel()
+    assert ticks > 10  # loop was not blocked
+    assert [f.result() for f in futures] == [1, 0.5, 0.25, 0.2]
+    assert f_cb.result() == 5
+    assert isinstance(getres.flat(f_err), ZeroDivisionError)
+    assert not pool._executors  # shut down on exit
+
+
+@pytest.mark.asyncio
+async def test_map_executor():
+    todo = [1, 2, 4, 5, 0]
+    async with AioPool(size=2) as pool:
+        started = time.perf_counter()
+        res = await pool.map(blocking, todo, executor='thread')
+        assert time.perf_counter() - started < 0.4  # 3 rounds of 0.1
+        assert res[:4] == [1, 0.5, 0.25, 0.2]
+        assert isinstance(res[4], ZeroDivisionError)
+
+        futures = pool.map_n(blocking, todo[:4], cb, 2, executor='thread')
+        await aio.wait(futures)
+        assert [f.result() for f in futures] == [2, 1, 0.5, 0.4]
+
+        res = []
+        async for r in pool.itermap(blocking, todo[:4], executor='thread',
+                                    ordered=True):
+            res.append(r)
+        assert res == [1, 0.5, 0.25, 0.2]
+
+        with pytest.raises(ValueError):
+            await pool.map(blocking, todo, executor='fiber')
+
+
+@pytest.mark.asyncio
+async def test_process_executor():
+    async with AioPool(size=4) as pool:
+        pids = await pool.map(whoami, range(8), executor='process')
+    assert os.getpid() not in pids
+
+    with ThreadPoolExecutor(2) as executor:
+        pool = AioPool(size=4)
+        res = await pool.map(blocking, [1, 2], executor=executor)
+        assert res == [1, 0.5]
+        assert not pool._executors  # not managed by pool
+
+
+@pytest.mark.asyncio
+async def test_cancel_sync():
+    async with AioPool(size=1) as pool:
+        f1, f2, f3 = pool.map_n(blocking, [1, 2, 4], executor='thread')
+        await aio.sleep(0.01)
+        cancelled, results = await pool.cancel(f1, f3)  # running and waiting
+        assert cancelled == 2
+        assert all(isinstance(r, aio.CancelledError) for r in results)
+    assert f2.result() == 0.5
+
+
+@pytest.mark.asyncio
+async def test_shutdown_not_blocking():
+    loop = aio.get_event_loop()
+    ticks = []
+
+    async def ticker():
+        while True:
+            ticks.append(loop.time())
+            await aio.sleep(0.01)
+
+    tick = loop.create_task(ticker())
+    async with AioPool(size=1) as pool:
+        fut = await pool.spawn_sync(time.sleep, 0.3)
+        await aio.sleep(0.01)
+        await pool.cancel(fut)  # but it's still running in thread
+    await aio.sleep(0.02)
+    tick.cancel()
+    assert not pool._executors
+    assert max(b - a for a, b in zip(ticks, ticks[1:])) < 0.1
@@ -0,0 +1,54 @@
+import pytest
+import asyncio as aio
+from asyncio_pool import AioPool, AioWorkerPool
+
+
+class Log:
+    def __init__(self):
+        self.started = []
+
+    async def wrk(self, item):
+        self.started.append(item)
+        await aio.sleep(0)
+        return item
+
+
+@pytest.mark.parametrize('pool_cls', [AioPool, AioWorkerPool])
+@pytest.mark.asyncio
+async def test_fair(pool_cls):
+    log = Log()
+    async with pool_cls(size=1, fair=True) as pool:
+        pool.map_n(log.wrk, ['a%d' % i for i in range(20)])
+        pool.map_n(log.wrk, ['b%d' % i for i in range(3)])
+    # small job does not wait for the big one, they take turns
+    assert log.started.index('b2') <= 6
+    assert [s for s in log.started if s[0] == 'a'] == \
+        ['a%d' % i for i in range(20)]
+
+    log = Log()
+    async with pool_cls(size=1) as pool:  # not fair
+        pool.map_n(log.wrk, ['a%d' % i for i in range(20)])
+        pool.map_n(log.wrk, ['b%d' % i for i in range(3)])
+    assert log.started.index('b0') == 20
+
+
+@pytest.mark.parametrize('pool_cls', [AioPool, AioWorkerPool])
+@pytest.mark.asyncio
+async def test_fair_weight(pool_cls):
+    log = Log()
+    async with pool_cls(size=1, fair=True) as pool:
+        pool.map_n(log.wrk, ['a%d' % i for i in range(40)])
+        pool.map_n(log.wrk, ['b%d' % i for i in range(40)], weight=3)
+        pool.spawn_n(log.wrk('p'), priority=1)
+    first = log.started[:21]
+    assert 'p' in log.started[:2]  # priority first
+    assert 13 <= sum(s[0] == 'b' for s in first) <= 17  # about 3:1
+
+    log = Log()
+    async with pool_cls(size=1, fair=True) as pool:
+        for i in range(5):
+            pool.spawn_n(log.wrk('x%d' % i), job='x')
+            pool.spawn_n(log.wrk('y%d' % i), job='y')
+        pool.spawn_n(log.wrk('z'))
+    assert log.started.index('z') <= 3
+    assert not pool._jobs
@@ -0,0 +1,110 @@
+import sys
+import pytest
+import asyncio as aio
+from asyncio_pool import AioPool, AioWorkerPool, Group
+
+
+pytestmark = pytest.mark.skipif(sys.version_info < (3, 7),
+                                reason='groups require python3.7+')
+
+
+class Crawler:
+    # "directory" `path` has 3 subdirectories until depth 3, listing is
+    # saved with another pool, callback spawns the next level
+    def __init__(self, api, db):
+        self.api, self.db = api, db
+        self.saved = []
+
+    async def ls(self, path):
+        await aio.sleep(0.001)
+        return [path + (i,) for i in range(3)] if len(path) < 3 else []
+
+    async def save(self, path):
+        await aio.sleep(0.001)
+        self.saved.append(path)
+
+    async def ls_cb(self, res, err, ctx):
+        await aio.sleep(0.001)  # pools may be empty for a moment here
+        for path in res:
+            self.api.spawn_n(self.ls(path), self.ls_cb)
+            self.db.spawn_n(self.save(path))
+
+
+@pytest.mark.parametrize('pool_cls', [AioPool, AioWorkerPool])
+@pytest.mark.asyncio
+async def test_group_recursive(pool_cls):
+    api, db = pool_cls(size=2), pool_cls(size=5)
+    crawler = Crawler(api, db)
+
+    async with Group() as group:
+        await api.spawn(crawler.ls(()), crawler.ls_cb)
+        assert len(group) == 1
+    assert group.is_empty and api.is_empty and db.is_empty
+    assert len(crawler.saved) == 3 + 9 + 27
+    assert not api._grouped and not db._grouped
+
+
+@pytest.mark.parametrize('pool_cls', [AioPool, AioWorkerPool])
+@pytest.mark.asyncio
+async def test_group_join(pool_cls):
+    pool = pool_cls(size=3)
+    done = []
+
+    async def wrk(i):
+        await aio.sleep(0.01 * i)
+        done.append(i)
+        if i < 3:
+            pool.spawn_n(wrk(i + 1))
+
+    group = Group()
+    async with group:
+        pool.spawn_n(wrk(1))
+    outsider = pool.spawn_n(aio.sleep(0.2))  # not a member of group
+    assert done == [1, 2, 3]
+    assert await group.join() is True  # nothing to wait for
+
+    async with group:
+        futures = pool.map_n(wrk, [3, 3])
+        assert len(group) == 2
+    assert all(f.done() for f in futures) and not outsider.done()
+    await pool.cancel()
+
+
+@pytest.mark.parametrize('pool_cls', [AioPool, AioWorkerPool])
+@pytest.mark.asyncio
+async def test_group_async_source(pool_cls):
+    async def source():
+        for i in range(5):
+            await aio.sleep(0.005)  # nothing is running meanwhile
+            yield i
+
+    async def wrk(i):
+        return i
+
+    async with pool_cls(size=2) as pool:
+        async with Group():
+            feeder = pool.map_n(wrk, source())
+        assert feeder.done()
+        assert sorted(f.result() for f in feeder.result()) == list(range(5))
+
+
+@pytest.mark.parametrize('pool_cls', [AioPool, AioWorkerPool])
+@pytest.mark.asyncio
+async def test_group_cancel(pool_cls):
+    pool = pool_cls(size=2)
+    futures = []
+
+    async def wrk(i):
+        futures.append(pool.spawn_n(wrk(i + 1)))
+        await aio.sleep(10)
+
+    with pytest.raises(ZeroDivisionError):
+        async with Group() as group:
+            futures.append(pool.spawn_n(wrk(0)))
+            await aio.sleep(0.01)
+            1 / 0
+    assert group.is_empty and pool.is_empty
+    assert len(futures) >= 2
+    for fut in futures:  # active ones get exception, waiting are cancelled
+        assert fut.cancelled() or \
+            isinstance(fut.exception(), aio.CancelledError)
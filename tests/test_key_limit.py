@@ -0,0 +1,101 @@
+import pytest
+import asyncio as aio
+from collections import Counter
+from asyncio_pool import AioPool, AioWorkerPool, getres
+
+
+class Hosts:
+    # tracks max number of concurrent requests per host
+    def __init__(self):
+        self.active, self.max = Counter(), Counter()
+
+    async def get(self, url):
+        host = url.split('/')[0]
+        self.active[host] += 1
+        self.max[host] = max(self.max[host], self.active[host])
+        await aio.sleep(0.02 if host == 'slow' else 0.001)
+        self.active[host] -= 1
+        return url
+
+
+@pytest.mark.parametrize('pool_cls', [AioPool, AioWorkerPool])
+@pytest.mark.asyncio
+async def test_key_limit(pool_cls):
+    hosts = Hosts()
+    urls = ['slow/%d' % i for i in range(10)] + \
+        ['fast/%d' % i for i in range(10)]
+    host = lambda url: url.split('/')[0]
+
+    async with pool_cls(size=10, key_limit=2) as pool:
+        futures = pool.map_n(hosts.get, urls, key=host)
+        await aio.wait(futures[10:])
+        # fast host is not stuck behind slow one
+        assert sum(f.done() for f in futures[:10]) <= 4
+    assert [getres.flat(f) for f in futures] == urls
+    assert hosts.max == {'slow': 2, 'fast': 2}
+    assert not pool._key_active and not pool._deferred
+
+    hosts = Hosts()
+    limits = {'slow': 1}
+    async with pool_cls(size=10, key_limit=limits.get) as pool:
+        assert urls == await pool.map(hosts.get, urls, key=host)
+    assert hosts.max['slow'] == 1
+
+    hosts = Hosts()
+    async with pool_cls(size=10, key_limit=limits.get) as pool:
+        futures = pool.map_n(hosts.get, urls, key=host)
+    assert hosts.max == {'slow': 1, 'fast': 9}  # not capped
+
+
+@pytest.mark.parametrize('pool_cls', [AioPool, AioWorkerPool])
+@pytest.mark.asyncio
+async def test_key_limit_map(pool_cls):
+    loop = aio.get_event_loop()
+    urls = ['slow/%d' % i for i in range(3)] + \
+        ['fast/%d' % i for i in range(3)]
+    host = lambda url: url.split('/')[0]
+
+    async def source():
+        for url in urls:
+            yield url
+
+    for iterable in (urls, source()):
+        started = {}
+
+        async def get(url):
+            started[url] = loop.time()
+            await aio.sleep(0.02)
+
+        async with pool_cls(size=10, key_limit={'slow': 1}.get) as pool:
+            begin = loop.time()
+            await pool.map(get, iterable, key=host)
+        # fast ones are not waiting for slow ones to start
+        assert max(started['fast/%d' % i] - begin for i in range(3)) < 0.015
+        assert started['slow/2'] - begin > 0.035
+
+
+@pytest.mark.parametrize('pool_cls', [AioPool, AioWorkerPool])
+@pytest.mark.asyncio
+async def test_key_limit_cancel(pool_cls):
+    started = []
+
+    async def wrk(i):
+        started.append(i)
+        await aio.sleep(0.01)
+        return i
+
+    async with pool_cls(size=4, key_limit=1) as pool:
+        futures = [pool.spawn_n(wrk(0), key='host')]
+        await aio.sleep(0)  # workers of worker pool start lazily
+        futures += [pool.spawn_n(wrk(i), key='host', priority=int(i == 4))
+                    for i in range(1, 6)]
+        other = pool.spawn_n(wrk(6), key='other')
+        await aio.sleep(0.001)
+        assert pool.n_active == 2
+        await pool.cancel(*futures[1:3])  # deferred ones
+        await pool.cancel(futures[0])  # active one, next starts
+
+    results = [getres.flat(f) for f in futures]
+    assert all(isinstance(r, aio.CancelledError) for r in results[:3])
+    assert results[3:] == [3, 4, 5] and other.result() == 6
+    assert started == [0, 6, 4, 3, 5]  # priority is kept
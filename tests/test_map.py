@@ -1,6 +1,6 @@
 import pytest
 import asyncio as aio
-from asyncio_pool import AioPool, getres
+from asyncio_pool import AioPool, AioWorkerPool, getres
 
 
 async def wrk(n):
@@ -66,4 +66,437 @@ async def test_itermap_cancel():
             if res == 13:
                 cancelled, _ = await pool.cancel()
                 break
-    assert cancelled == 100 - 13
\ No newline at end of file
+    assert cancelled == 100 - 13
+
+
+@pytest.mark.parametrize('prefetch', [0, 3])
+@pytest.mark.asyncio
+async def test_itermap_lazy(prefetch):
+
+    async def wrk(n):
+        await aio.sleep(0.01)
+        return n
+
+    pulled, yielded, size = 0, 0, 5
+
+    def gen(todo):
+        nonlocal pulled
+        for i in todo:
+            pulled += 1
+            assert pulled - yielded <= size + prefetch
+            yield i
+
+    todo = range(50)
+    res = []
+    async with AioPool(size=size) as pool:
+        async for i in pool.itermap(wrk, gen(todo), lazy=True,
+                prefetch=prefetch, yield_when=aio.FIRST_COMPLETED):
+            yielded += 1
+            res.append(i)
+
+    assert pulled == yielded == len(todo)
+    assert sorted(res) == list(todo)
+
+
+@pytest.mark.parametrize('ordered', [False, True])
+@pytest.mark.asyncio
+async def test_itermap_lazy_cancel(ordered):
+    started = []
+
+    async def wrk(n):
+        started.append(n)
+        await aio.sleep(0.01)
+        return n
+
+    res = []
+    async with AioPool(size=3) as pool:
+        async for r in pool.itermap(wrk, range(50), lazy=True, prefetch=2,
+                ordered=ordered, yield_when=aio.FIRST_COMPLETED):
+            res.append(r)
+            if r == 0:
+                await pool.cancel()  # stops pulling items too
+    assert len(res) == 5 and len(started) <= 5
+    assert all(r in (1, 2) or isinstance(r, aio.CancelledError)
+               for r in res[1:])  # first ones could be done already
+
+
+@pytest.mark.asyncio
+async def test_itermap_lazy_async_source():
+
+    async def wrk(n):
+        await aio.sleep(0.01)
+        return n
+
+    async def source(todo):
+        for i in todo:
+            await aio.sleep(0)
+            yield i
+
+    todo = range(20)
+    async with AioPool(size=3) as pool:
+        res = []
+        async for batch in pool.itermap(wrk, source(todo), lazy=True,
+                flat=False):
+            assert len(batch) <= 3
+            res.extend(batch)
+
+    assert sorted(res) == list(todo)
+
+
+@pytest.mark.parametrize('flat', [True, False])
+@pytest.mark.asyncio
+async def test_itermap_ordered(flat):
+
+    async def wrk(n):
+        await aio.sleep((n % 7) / 100)
+        return n
+
+    pulled, yielded, size, prefetch = 0, 0, 4, 2
+
+    def gen(todo):
+        nonlocal pulled
+        for i in todo:
+            pulled += 1
+            assert pulled - yielded <= size + prefetch  # reorder buffer
+            yield i
+
+    todo = range(40)
+    res = []
+    async with AioPool(size=size) as pool:
+        async for batch in pool.itermap(wrk, gen(todo), flat=flat,
+                ordered=True, prefetch=prefetch):
+            batch = [batch] if flat else batch
+            yielded += len(batch)
+            res.extend(batch)
+
+    assert res == list(todo)
+
+
+@pytest.mark.asyncio
+async def test_itermap_ordered_head_of_line():
+
+    async def wrk(n):
+        await aio.sleep(0.3 if n == 0 else 0.01)
+        return n
+
+    started = []
+    def gen(todo):
+        for i in todo:
+            started.append(i)
+            yield i
+
+    async with AioPool(size=10) as pool:
+        async for res in pool.itermap(wrk, gen(range(100)), ordered=True):
+            assert res == 0
+            assert len(started) == 10  # slow head blocks spawning
+            break
+        await pool.cancel()
+
+
+@pytest.mark.asyncio
+async def test_iterwait():
+    from asyncio_pool import iterwait
+
+    async def wrk(n):
+        await aio.sleep(n / 100)
+        if n == 3:
+            raise ValueError(n)
+        return n
+
+    async with AioPool(size=10) as pool:
+        futures = pool.map_n(wrk, [5, 1, 4, 2])
+        res = [r async for r in iterwait(futures,
+                                          yield_when=aio.FIRST_COMPLETED)]
+        assert res == [1, 2, 4, 5]  # in order of completion
+
+        futures = pool.map_n(wrk, [1, 3, 5, 7])
+        batches = [b async for b in iterwait(futures, flat=False,
+                                              yield_when=aio.FIRST_EXCEPTION)]
+        assert batches[0][0] == 1 and isinstance(batches[0][1], ValueError)
+        assert batches[1:] == [[5, 7]]
+
+        futures = pool.map_n(wrk, [1, 2, 30])
+        batches = [b async for b in iterwait(futures, flat=False,
+                                              timeout=0.1)]
+        assert [] in batches  # timed out waiting for 30
+        assert [b for b in batches if b] == [[1, 2], [30]]
+
+
+@pytest.mark.parametrize('chunksize', [1, 3, 10])
+@pytest.mark.asyncio
+async def test_map_chunks(chunksize):
+    todo = range(25)
+
+    async def wrk(n):
+        await aio.sleep(0.001)
+        return 1 / n and n * 10
+
+    async def cb(res, err, ctx):
+        if err:
+            return err[0]
+        return res + ctx
+
+    async with AioPool(size=3) as pool:
+        res = await pool.map(wrk, todo, chunksize=chunksize)
+        assert isinstance(res[0], ZeroDivisionError)
+        assert res[1:] == [i * 10 for i in todo[1:]]
+        n_chunks = -(-len(todo) // chunksize)
+        assert pool._executed == n_chunks
+
+        futures = pool.map_n(wrk, todo, cb, 1, chunksize=chunksize)
+        await aio.wait(futures)
+        assert len(futures) == len(todo)
+        assert isinstance(futures[0].result(), ZeroDivisionError)
+        assert [f.result() for f in futures[1:]] == \
+            [i * 10 + 1 for i in todo[1:]]
+
+        res = []
+        async for r in pool.itermap(wrk, todo[1:], chunksize=chunksize,
+                                    ordered=True):
+            res.append(r)
+        assert res == [i * 10 for i in todo[1:]]
+
+
+@pytest.mark.asyncio
+async def test_map_chunks_sync_raise():
+
+    def wrk(n):  # raises before coroutine is created
+        if n == 2:
+            raise ValueError(n)
+        return aio.sleep(0, n)
+
+    def wrk_batch(items):
+        if 7 in items:
+            raise ValueError(items)
+        return {i for i in items}  # not a list
+
+    async with AioPool(size=2) as pool:
+        res = await pool.map(wrk, range(5), chunksize=5)
+        assert isinstance(res[2], ValueError)
+        assert res[:2] + res[3:] == [0, 1, 3, 4]
+
+        res = await pool.map(wrk_batch, range(10), chunksize=5, batched=True)
+        assert all(isinstance(e, TypeError) for e in res[:5])
+        assert all(isinstance(e, ValueError) for e in res[5:])
+
+
+@pytest.mark.asyncio
+async def test_map_batched():
+    calls = []
+
+    async def wrk_batch(items):
+        calls.append(items)
+        await aio.sleep(0.01)
+        if 13 in items:
+            raise ValueError()
+        if 17 in items:
+            return []  # wrong length
+        return [i * 10 for i in items]
+
+    async with AioPool(size=2) as pool:
+        res = await pool.map(wrk_batch, range(20), chunksize=5, batched=True)
+        assert calls == [list(range(i, i + 5)) for i in range(0, 20, 5)]
+        assert res[:10] == [i * 10 for i in range(10)]
+        assert all(isinstance(e, ValueError) for e in res[10:])
+
+        res = []
+        async for r in pool.itermap(wrk_batch, range(10), chunksize=4,
+                                    batched=True, lazy=True):
+            res.append(r)
+        assert sorted(res) == [i * 10 for i in range(10)]
+
+
+@pytest.mark.asyncio
+async def test_map_chunks_cancel():
+
+    async def wrk_slow(n):
+        await aio.sleep(0 if n < 5 else 10)
+        return n
+
+    async with AioPool(size=2) as pool:
+        futures = pool.map_n(wrk_slow, range(20), chunksize=5)
+        await aio.sleep(0.1)
+        cancelled, _ = await pool.cancel()
+        assert cancelled == 3  # chunks, first one is done
+    results = [getres.flat(f) for f in futures]
+    assert results[:5] == list(range(5))
+    assert all(isinstance(r, aio.CancelledError) for r in results[5:])
+
+
+class Source:
+    # async iterable, remembering how far ahead of started items it was pulled
+    def __init__(self, n):
+        self.n, self.pulled, self.started, self.ahead = n, 0, 0, 0
+
+    def __aiter__(self):
+        return self._gen()
+
+    async def _gen(self):
+        for i in range(self.n):
+            await aio.sleep(0)
+            self.pulled += 1
+            self.ahead = max(self.ahead, self.pulled - self.started)
+            yield i
+
+    async def wrk(self, n):
+        self.started += 1
+        await aio.sleep(0.01)
+        return n * 10
+
+
+@pytest.mark.parametrize('pool_cls', [AioPool, AioWorkerPool])
+@pytest.mark.parametrize('chunksize', [1, 3])
+@pytest.mark.asyncio
+async def test_map_async_source(pool_cls, chunksize):
+    source = Source(20)
+    async with pool_cls(size=2) as pool:
+        res = await pool.map(source.wrk, source, chunksize=chunksize)
+        assert res == [i * 10 for i in range(20)]
+        assert await pool.map(wrk, Source(0)) == []
+        assert await pool.map(wrk, []) == []
+    assert source.ahead <= 3 * chunksize  # never buffered whole source
+
+
+@pytest.mark.parametrize('pool_cls', [AioPool, AioWorkerPool])
+@pytest.mark.asyncio
+async def test_map_n_async_source(pool_cls):
+    source = Source(20)
+    async with pool_cls(size=2) as pool:
+        feeder = pool.map_n(source.wrk, source)
+        assert not pool.is_empty
+    assert feeder.done()  # joined
+    assert [getres.flat(f) for f in feeder.result()] == \
+        [i * 10 for i in range(20)]
+    assert source.ahead <= 3
+
+    source = Source(20)
+    async with pool_cls(size=2) as pool:
+        feeder = pool.map_n(source.wrk, source)
+        await aio.sleep(0.025)
+        await pool.cancel()
+        await aio.sleep(0.01)
+        assert pool.is_empty
+    assert source.pulled < 20
+
+
+@pytest.mark.asyncio
+async def test_itermap_async_source():
+    source = Source(20)
+    async with AioPool(size=2) as pool:
+        res = [r async for r in pool.itermap(source.wrk, source)]
+    assert sorted(res) == [i * 10 for i in range(20)]
+    assert source.ahead <= 3
+
+
+@pytest.mark.parametrize('pool_cls', [AioPool, AioWorkerPool])
+@pytest.mark.parametrize('ordered', [False, True])
+@pytest.mark.asyncio
+async def test_map_into(pool_cls, ordered):
+    source, results = Source(20), []
+    async with pool_cls(size=2) as pool:
+        n = await pool.map_into(source.wrk, source, results.append,
+                                ordered=ordered)
+        assert n == 20 and not pool._waiting
+    assert source.ahead <= 3
+    if ordered:
+        assert results == [i * 10 for i in range(20)]
+    assert sorted(results) == [i * 10 for i in range(20)]
+
+    queue = aio.Queue(2)  # slow consumer slows down spawning
+
+    async def consume():
+        res = []
+        while len(res) < 10:
+            res.append(await queue.get())
+            await aio.sleep(0.01)
+        return res
+
+    source = Source(10)
+    async with pool_cls(size=5) as pool:
+        consumer = aio.ensure_future(consume())
+        await pool.map_into(source.wrk, source, queue, chunksize=2)
+        assert sorted(await consumer) == [i * 10 for i in range(10)]
+    assert source.ahead <= 10
+
+
+class Writer:
+    def __init__(self):
+        self.written, self.drained = [], 0
+
+    def write(self, data):
+        self.written.append(data)
+
+    async def drain(self):
+        self.drained += 1
+
+
+@pytest.mark.asyncio
+async def test_map_into_writer():
+    writer = Writer()
+    async with AioPool(size=3) as pool:
+        await pool.map_into(wrk, [10, 20, 40], writer, ordered=True,
+                            get_result=getres.pair)
+        assert writer.written == [(100, None), (200, None), (400, None)]
+        assert writer.drained == 3
+
+        with pytest.raises(TypeError):
+            await pool.map_into(wrk, [1], object())
+
+        async def broken(res):
+            raise ValueError(res)
+
+        with pytest.raises(ValueError):
+            await pool.map_into(wrk, [10, 1, 1, 1], broken)
+        assert pool.is_empty  # the rest is cancelled
+
+
+@pytest.mark.parametrize('pool_cls', [AioPool, AioWorkerPool])
+@pytest.mark.parametrize('batched', [False, True])
+@pytest.mark.asyncio
+async def test_map_into_chunks_cancel(pool_cls, batched):
+    async def wrks(items):
+        return [await wrk(i) for i in items]
+
+    async def broken(res):
+        raise ValueError(res)
+
+    fn = wrks if batched else wrk
+    async with pool_cls(size=2) as pool:
+        with pytest.raises(ValueError):
+            await pool.map_into(fn, [100] * 10 + [1] * 20, broken,
+                                chunksize=10, batched=batched)
+        assert len(pool) == 0  # slow chunks are cancelled too
+
+        with pytest.raises(ZeroDivisionError):
+            await pool.reduce(fn, [0] + [1] * 19, lambda a, b: a + b,
+                              chunksize=10, batched=batched)
+        assert len(pool) == 0
+
+
+@pytest.mark.parametrize('pool_cls', [AioPool, AioWorkerPool])
+@pytest.mark.asyncio
+async def test_reduce(pool_cls):
+    source = Source(20)
+    async with pool_cls(size=2) as pool:
+        total = await pool.reduce(source.wrk, source, lambda a, b: a + b)
+        assert total == sum(i * 10 for i in range(20))
+        assert source.ahead <= 3
+
+        async def merge(acc, res):
+            await aio.sleep(0)
+            return acc + [res]
+
+        res = await pool.reduce(wrk, [10, 20, 40], merge, [], ordered=True)
+        assert res == [100, 200, 400]
+        assert await pool.reduce(wrk, [], merge, 'initial') == 'initial'
+        with pytest.raises(TypeError):
+            await pool.reduce(wrk, [], merge)
+
+        with pytest.raises(ZeroDivisionError):
+            await pool.reduce(wrk, [1, 0, 1, 1], merge, [])
+        assert pool.is_empty  # the rest is cancelled
+
+        res = await pool.reduce(wrk, [10, 0], merge, [], ordered=True,
+                                get_result=getres.pair)
+        assert res[0] == (100, None)
+        assert isinstance(res[1][1], ZeroDivisionError)
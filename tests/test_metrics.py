@@ -0,0 +1,53 @@
+import pytest
+import asyncio as aio
+from asyncio_pool import AioPool, AioWorkerPool, Metrics
+from asyncio_pool.metrics import Histogram
+
+
+async def wrk(n):
+    await aio.sleep(0.01)
+    return 1 / n
+
+
+async def cb(res, err):
+    await aio.sleep(0)
+    return res
+
+
+def test_histogram():
+    hist = Histogram((0.1, 1, 10))
+    for value in (0.05, 0.1, 0.5, 5, 50):
+        hist.observe(value)
+    snap = hist.snapshot()
+    assert snap['count'] == 5 and snap['max'] == 50
+    assert snap['buckets'] == {'0.1': 2, '1': 1, '10': 1, '+Inf': 1}
+    assert hist.quantile(0.4) == 0.1 and hist.quantile(0.5) == 1
+    assert hist.quantile(1) == 50
+    assert Histogram().quantile(0.5) == 0
+
+
+@pytest.mark.parametrize('pool_cls', [AioPool, AioWorkerPool])
+@pytest.mark.asyncio
+async def test_metrics(pool_cls):
+    metrics = Metrics()
+    events = []
+    metrics.hooks.append(lambda event, seconds, exc: events.append(event))
+
+    async with pool_cls(size=2, metrics=metrics) as pool:
+        await pool.map(wrk, range(4), cb)
+        futures = pool.map_n(wrk, range(1, 5))
+        await aio.sleep(0.005)
+        await pool.cancel()
+
+    snap = metrics.snapshot()
+    assert snap['spawned'] == 8 and snap['started'] == 6
+    assert snap['finished'] == 6 and snap['errors'] == 1
+    assert snap['cancelled'] == 4  # 2 active and 2 waiting
+    assert snap['exec']['count'] == 6 and snap['callback']['count'] == 4
+    assert snap['wait']['count'] == 6 and snap['wait']['max'] >= 0.01
+    assert 0.01 <= snap['exec']['max'] < 0.1
+    assert snap['throughput'] > 0
+    assert events.count('exec') == 6 and events.count('callback') == 4
+
+    metrics.reset()
+    assert metrics.snapshot()['exec']['count'] == 0
@@ -0,0 +1,169 @@
+import pytest
+import asyncio as aio
+from asyncio_pool import AioPool, AioWorkerPool, Metrics, getres
+
+
+async def wrk(i, sleep=0.01):
+    await aio.sleep(sleep)
+    return i
+
+
+@pytest.mark.parametrize('pool_cls', [AioPool, AioWorkerPool])
+@pytest.mark.asyncio
+async def test_overflow_raise(pool_cls):
+    async with pool_cls(size=1, max_waiting=2, overflow='raise') as pool:
+        futures = [pool.spawn_n(wrk(i)) for i in range(3)]
+        coro = wrk(3)
+        with pytest.raises(aio.QueueFull):
+            pool.spawn_n(coro)
+        assert coro.cr_frame is None  # closed
+        with pytest.raises(aio.QueueFull):
+            pool.map_n(wrk, [4, 5])
+        assert len(pool) == 3
+    assert [getres.flat(f) for f in futures] == [0, 1, 2]
+    assert pool.n_dropped == 0
+
+    with pytest.raises(ValueError):
+        pool_cls(size=1, max_waiting=2, overflow='sometimes')
+
+
+@pytest.mark.parametrize('pool_cls', [AioPool, AioWorkerPool])
+@pytest.mark.asyncio
+async def test_overflow_drop(pool_cls):
+    metrics = Metrics()
+    async with pool_cls(size=1, max_waiting=2, overflow='drop_new',
+                        metrics=metrics) as pool:
+        futures = pool.map_n(wrk, range(5))
+    assert [getres.flat(f) for f in futures[:3]] == [0, 1, 2]
+    assert all(f.cancelled() for f in futures[3:])
+    assert pool.n_dropped == 2
+    assert metrics.dropped == 2 and metrics.cancelled == 2
+    assert metrics.spawned == 5 and metrics.finished == 3
+
+    async with pool_cls(size=1, max_waiting=2, overflow='drop_old') as pool:
+        futures = pool.map_n(wrk, range(5))
+    # the first one is active, 1 and 2 give way to 3 and 4
+    assert [f.cancelled() for f in futures] == [False, True, True, False,
+                                                False]
+    assert [getres.flat(f) for f in futures[3:]] == [3, 4]
+    assert pool.n_dropped == 2 and len(pool._queue) == 0
+
+
+@pytest.mark.parametrize('pool_cls', [AioPool, AioWorkerPool])
+@pytest.mark.asyncio
+async def test_overflow_priority(pool_cls):
+    async with pool_cls(size=1, max_waiting=3, overflow='priority') as pool:
+        active = pool.spawn_n(wrk('active'))
+        low = pool.spawn_n(wrk('low'), priority=-1)
+        normal = pool.spawn_n(wrk('normal'))
+        high = pool.spawn_n(wrk('high'), priority=5)
+
+        higher = pool.spawn_n(wrk('higher'), priority=3)
+        assert low.cancelled() and pool.n_dropped == 1
+        lowest = pool.spawn_n(wrk('lowest'), priority=-5)  # it's lowest
+        assert lowest.cancelled() and pool.n_dropped == 2
+        newest = pool.spawn_n(wrk('newest'))  # no lower than it
+        assert newest.cancelled() and pool.n_dropped == 3
+        highest = pool.spawn_n(wrk('highest'), priority=10)
+        assert normal.cancelled() and pool.n_dropped == 4
+
+        await pool.join()
+    assert [getres.flat(f) for f in (active, high, higher, highest)] == \
+        ['active', 'high', 'higher', 'highest']
+
+
+@pytest.mark.parametrize('pool_cls', [AioPool, AioWorkerPool])
+@pytest.mark.asyncio
+async def test_overflow_block(pool_cls):
+    async with pool_cls(size=2, max_waiting=1) as pool:
+        futures = [pool.spawn_n(wrk(i, 0.05)) for i in range(3)]
+        with pytest.raises(aio.QueueFull):
+            pool.spawn_n(wrk(3))
+
+        spawning = aio.ensure_future(pool.spawn(wrk(4)))
+        await aio.sleep(0.01)
+        assert not spawning.done()  # no room in queue
+        # first ones are done, room is there
+        futures.append(await aio.wait_for(spawning, 1))
+
+        results = await pool.map(wrk, range(5, 10))
+        assert results == list(range(5, 10))
+        assert len(pool._waiting) <= pool.max_waiting + pool.size
+
+        pool.spawn_n(wrk(10))
+        pool.spawn_n(wrk(11))
+        pool.spawn_n(wrk(12))
+        coro = wrk(13)
+        spawning = aio.ensure_future(pool.spawn(coro))
+        await aio.sleep(0)
+        spawning.cancel()
+        with pytest.raises(aio.CancelledError):
+            await spawning
+        assert coro.cr_frame is None and not pool._room
+    assert [getres.flat(f) for f in futures] == [0, 1, 2, 4]
+
+
+@pytest.mark.parametrize('pool_cls', [AioPool, AioWorkerPool])
+@pytest.mark.parametrize('overflow', ['drop_new', 'drop_old', 'priority'])
+@pytest.mark.asyncio
+async def test_overflow_drop_spawn(pool_cls, overflow):
+    # new coroutine is dropped: no room, no victim, or it's the lowest
+    async def source():
+        for i in range(3):
+            yield i
+
+    max_waiting = 0 if overflow == 'drop_old' else 1
+    async with pool_cls(size=1, max_waiting=max_waiting,
+                        overflow=overflow) as pool:
+        pool.map_n(wrk, range(max_waiting + 1))
+        fut = await aio.wait_for(pool.spawn(wrk('new'), priority=-1), 1)
+        assert fut.cancelled()
+        with pytest.raises(aio.CancelledError):
+            await aio.wait_for(pool.exec(wrk('new'), priority=-1), 1)
+
+        results = await aio.wait_for(pool.map(wrk, range(3), priority=-1), 1)
+        assert all(isinstance(r, aio.CancelledError) for r in results)
+        results = await aio.wait_for(pool.map(wrk, source(), priority=-1), 1)
+        assert all(isinstance(r, aio.CancelledError) for r in results)
+        assert pool.n_dropped == 8
+
+
+@pytest.mark.parametrize('pool_cls', [AioPool, AioWorkerPool])
+@pytest.mark.asyncio
+async def test_overflow_block_no_queue(pool_cls):
+    # nothing may wait, `spawn` is woken when active coroutine is done
+    async with pool_cls(size=1, max_waiting=0) as pool:
+        results = await aio.wait_for(pool.map(wrk, range(3)), 1)
+        assert results == [0, 1, 2]
+
+        fut = pool.spawn_n(wrk('cancelled', 1))
+        spawning = aio.ensure_future(pool.spawn(wrk('next')))
+        await aio.sleep(0)
+        await pool.cancel(fut)
+        fut = await aio.wait_for(spawning, 1)
+        assert await fut == 'next'
+
+        pool.spawn_n(wrk('slow', 1))
+        spawning = aio.ensure_future(pool.spawn(wrk('resized')))
+        await aio.sleep(0)
+        pool.resize(2)
+        fut = await aio.wait_for(spawning, 0.5)
+        assert await fut == 'resized'
+        await pool.cancel()
+
+
+@pytest.mark.parametrize('pool_cls', [AioPool, AioWorkerPool])
+@pytest.mark.parametrize('chunksize', [1, 3])
+@pytest.mark.asyncio
+async def test_overflow_block_lazy(pool_cls, chunksize):
+    # lazy windows, wider than `max_waiting`, wait for room
+    async with pool_cls(size=2, max_waiting=1) as pool:
+        res = [r async for r in pool.itermap(wrk, range(10), lazy=True,
+                                              prefetch=4, flat=True,
+                                              chunksize=chunksize)]
+        assert sorted(res) == list(range(10))
+
+        out = []
+        n = await aio.wait_for(pool.map_into(wrk, range(10), out.append,
+            prefetch=4, ordered=True, chunksize=chunksize), 1)
+        assert n == 10 and out == list(range(10))
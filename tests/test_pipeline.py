@@ -0,0 +1,147 @@
+import pytest
+import asyncio as aio
+from asyncio_pool import Pipeline, AioWorkerPool
+
+
+async def double(n):
+    await aio.sleep(0.001)
+    return n * 2
+
+
+async def inc(n):
+    await aio.sleep(0)
+    return n + 1
+
+
+@pytest.mark.parametrize('ordered', [False, True])
+@pytest.mark.asyncio
+async def test_pipeline(ordered):
+    async def source(todo):
+        for i in todo:
+            await aio.sleep(0)
+            yield i
+
+    async with Pipeline(ordered=ordered) as pipe:
+        pipe.stage(double, 4).stage(inc, 2, pool=AioWorkerPool(2))
+        res = [r async for r in pipe.run(source(range(50)))]
+
+    expected = [i * 2 + 1 for i in range(50)]
+    assert res == expected if ordered else sorted(res) == expected
+    stats = pipe.stats()
+    assert [s['name'] for s in stats] == ['double', 'inc']
+    assert all(s['done'] == 50 and s['errors'] == 0 for s in stats)
+
+
+@pytest.mark.asyncio
+async def test_pipeline_backpressure():
+    pulled = []
+
+    def source():
+        for i in range(100):
+            pulled.append(i)
+            yield i
+
+    async def slow(n):
+        await aio.sleep(0.01)
+        return n
+
+    async with Pipeline() as pipe:
+        pipe.stage(inc, 10, maxsize=5).stage(slow, 1, maxsize=1)
+        res = []
+        async for r in pipe.run(source()):
+            res.append(r)
+            if len(res) == 5:
+                # fast stage is limited by it's pool and queue, not by source
+                assert len(pulled) <= 5 + 10 + 5 + 1 + 1
+                stats = pipe.stats()
+                assert stats[0]['queue'] <= 5 and stats[1]['queue'] <= 1
+                break
+
+
+@pytest.mark.asyncio
+async def test_pipeline_errors():
+    async def crash(n):
+        await aio.sleep(0)
+        assert n % 10, 'bad item'
+        return n
+
+    async with Pipeline() as pipe:
+        pipe.stage(crash, 3, on_error='skip').stage(inc, 3)
+        res = [r async for r in pipe.run(range(1, 31))]
+    assert sorted(res) == [n + 1 for n in range(1, 31) if n % 10]
+    assert pipe.stats()[0]['errors'] == 3
+
+    async with Pipeline() as pipe:
+        pipe.stage(crash, 3, on_error='yield').stage(inc, 3)
+        res = [r async for r in pipe.run(range(1, 31))]
+    assert len(res) == 30
+    assert sum(isinstance(r, AssertionError) for r in res) == 3
+
+    with pytest.raises(AssertionError):
+        async with Pipeline() as pipe:
+            pipe.stage(inc, 3).stage(crash, 3)
+            async for _ in pipe.run(range(1000)):
+                pass
+    assert all(s['done'] < 1000 for s in pipe.stats())
+
+    with pytest.raises(ValueError):
+        Pipeline().stage(inc, on_error='ignore')
+
+
+@pytest.mark.parametrize('batched', [False, True])
+@pytest.mark.asyncio
+async def test_pipeline_ordered_errors(batched):
+    async def crash(n):
+        await aio.sleep(0.001 * (10 - n))
+        if n in (2, 7):
+            raise ValueError(n)
+        return n
+
+    async def incs(items):
+        await aio.sleep(0)
+        return [n + 1 for n in items]
+
+    async def cb(res, err, ctx):
+        return err[0] if err else res * ctx
+
+    async with Pipeline(ordered=True) as pipe:
+        pipe.stage(crash, 4, on_error='yield')
+        if batched:
+            pipe.stage(incs, 2, chunksize=3, batched=True)
+        else:
+            pipe.stage(inc, 2, cb, 10, key=lambda n: n % 2)
+        pipe.stage(lambda n: n + 1, 2, executor='thread', on_error='yield')
+        res = [r async for r in pipe.run(range(10))]
+
+    assert [type(r) for r in res] == [int] * 2 + [ValueError] + \
+        [int] * 4 + [ValueError] + [int] * 2
+    k = 1 if batched else 10
+    assert [r for r in res if isinstance(r, int)] == \
+        [(n + 1) * k + 1 for n in range(10) if n not in (2, 7)]
+    assert pipe.stats()[1]['done'] == 8
+
+
+@pytest.mark.asyncio
+async def test_pipeline_shared_pool():
+    pool = AioWorkerPool(4)
+    other = pool.spawn_n(aio.sleep(0.5, 'other'))  # not pipeline's
+
+    async with Pipeline() as pipe:
+        pipe.stage(inc, 2, pool=pool).stage(double, 2)
+        res = [r async for r in pipe.run(range(10))]
+    assert sorted(res) == [(i + 1) * 2 for i in range(10)]
+
+    async def slow(n):
+        await aio.sleep(0.01 * n)
+        return n
+
+    async def crash(n):
+        raise ValueError(n)
+
+    with pytest.raises(ValueError):
+        async with Pipeline() as pipe:
+            pipe.stage(slow, 4, pool=pool).stage(crash)
+            async for _ in pipe.run(range(10)):
+                pass
+    assert pool.n_active == 1  # items of pipeline are cancelled
+    assert await other == 'other'
@@ -0,0 +1,96 @@
+import time
+import pytest
+import asyncio as aio
+from asyncio_pool import AioPool, AioWorkerPool, RateLimit
+
+
+async def wrk(n):
+    return time.monotonic()
+
+
+def test_reserve():
+    limit = RateLimit(10, burst=3)
+    delays = [limit.reserve() for _ in range(6)]
+    assert delays[:3] == [0, 0, 0]
+    assert [round(d, 2) for d in delays[3:]] == [0.1, 0.2, 0.3]
+
+    limit = RateLimit(10, per_key=True)
+    assert limit.reserve('a') == limit.reserve('b') == 0
+    assert round(limit.reserve('a'), 2) == 0.1
+
+    with pytest.raises(ValueError):
+        RateLimit(0)
+
+
+@pytest.mark.parametrize('pool_cls', [AioPool, AioWorkerPool])
+@pytest.mark.asyncio
+async def test_rate(pool_cls):
+    rate, burst, n = 50, 5, 30
+    async with pool_cls(size=100, rate_limit=RateLimit(rate, burst)) as pool:
+        started = time.monotonic()
+        results = await pool.map(wrk, range(n))
+
+    elapsed = results[-1] - started
+    ideal = (n - burst) / rate
+    assert ideal * 0.9 < elapsed < ideal * 1.3
+
+    # never more than burst + rate * t in any t seconds
+    k = burst + 5
+    windows = [b - a for a, b in zip(results, results[k:])]
+    assert min(windows) > 0.9 * (k - burst) / rate
+
+
+@pytest.mark.asyncio
+async def test_rate_per_key():
+    limit = RateLimit(20, per_key=True)
+    todo = ['a'] * 10 + ['b'] * 10 + ['c'] * 10
+
+    async with AioPool(size=100, rate_limit=limit) as pool:
+        started = time.monotonic()
+        futures = pool.map_n(wrk, todo, key=lambda it: it)
+        results = [await f for f in futures]
+        spawned = time.monotonic()
+        f_key = await pool.spawn(wrk(None), key='d')
+        assert await f_key - spawned < 0.05  # own bucket
+
+    elapsed = max(results) - started
+    assert 9 / 20 * 0.9 < elapsed < 9 / 20 * 1.3  # keys are not waiting
+
+
+@pytest.mark.asyncio
+async def test_rate_chunks_and_cancel():
+    limit = RateLimit(100)
+    async with AioPool(size=2, rate_limit=limit) as pool:
+        started = time.monotonic()
+        results = await pool.map(wrk, range(20), chunksize=10)
+        elapsed = max(results) - started
+        assert 19 / 100 * 0.9 < elapsed < 19 / 100 * 1.3  # per item
+
+        futures = pool.map_n(wrk, range(100))
+        await aio.sleep(0.1)
+        await pool.cancel()
+    n_done = sum(1 for f in futures if not f.cancelled() and
+                 not isinstance(f.exception(), aio.CancelledError))
+    assert 5 < n_done < 15
+
+
+@pytest.mark.parametrize('pool_cls', [AioPool, AioWorkerPool])
+@pytest.mark.asyncio
+async def test_rate_not_holding_space(pool_cls):
+    limit = RateLimit(5, per_key=True)
+    async with pool_cls(size=4, rate_limit=limit) as pool:
+        started = time.monotonic()
+        slow = pool.map_n(wrk, ['slow'] * 4, key=lambda it: it)
+        other = await pool.spawn(wrk('other'), key='other')
+        assert await other - started < 0.05  # not waiting behind slow ones
+        assert pool.n_active == 0 and len(pool) == 3  # waiting aside
+
+        results = [await f for f in slow]
+        elapsed = [r - started for r in results]
+        assert elapsed[0] < 0.05 and 0.55 < elapsed[-1] < 0.8
+        assert results == sorted(results)
+
+        # cancelled while waiting aside
+        futures = pool.map_n(wrk, ['slow'] * 3, key=lambda it: it)
+        cancelled, _ = await pool.cancel(*futures)
+        assert cancelled == 3 and pool.is_empty
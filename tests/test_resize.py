@@ -0,0 +1,143 @@
+import pytest
+import asyncio as aio
+from asyncio_pool import AioPool, AioWorkerPool, AimdController
+
+
+@pytest.mark.parametrize('pool_cls', [AioPool, AioWorkerPool])
+@pytest.mark.asyncio
+async def test_resize(pool_cls):
+    active, max_active = 0, 0
+    release = aio.Event()
+
+    async def wrk(n):
+        nonlocal active, max_active
+        active += 1
+        max_active = max(active, max_active)
+        await release.wait()
+        active -= 1
+        return n
+
+    async with pool_cls(size=2) as pool:
+        futures = pool.map_n(wrk, range(10))
+        await aio.sleep(0.01)
+        assert pool.n_active == 2 and len(pool) == 10
+
+        pool.resize(5)  # waiting ones start right away
+        await aio.sleep(0.01)
+        assert pool.n_active == active == 5
+
+        pool.resize(1)  # active ones are not interrupted
+        await aio.sleep(0.01)
+        assert pool.n_active == 5
+
+        release.set()
+        await aio.sleep(0.01)
+        assert max_active == 5
+
+    assert [f.result() for f in futures] == list(range(10))
+
+    with pytest.raises(ValueError):
+        pool.resize(0)
+
+
+@pytest.mark.parametrize('pool_cls', [AioPool, AioWorkerPool])
+@pytest.mark.asyncio
+async def test_resize_shrink(pool_cls):
+    active, max_active = 0, 0
+
+    async def wrk(n):
+        nonlocal active, max_active
+        active += 1
+        max_active = max(active, max_active)
+        await aio.sleep(0.02)
+        active -= 1
+        return n
+
+    async with pool_cls(size=4) as pool:
+        futures = pool.map_n(wrk, range(20))
+        await aio.sleep(0.01)
+        pool.resize(2)
+        await aio.sleep(0.03)  # first ones are done
+        max_active = active
+        await pool.join()
+        assert max_active == 2
+
+    assert [f.result() for f in futures] == list(range(20))
+
+
+@pytest.mark.parametrize('pool_cls', [AioPool, AioWorkerPool])
+@pytest.mark.asyncio
+async def test_resize_shrink_idle(pool_cls):
+    async def wrk(n):
+        await aio.sleep(n)
+        return n
+
+    pool = pool_cls(size=3)
+    busy = pool.spawn_n(wrk(0.05))
+    pool.map_n(wrk, [0, 0])
+    await aio.sleep(0.01)  # workers of these two are idle
+    pool.resize(1)
+    fut = pool.spawn_n(wrk(0))
+    await aio.wait_for(pool.join(), 1)
+    assert busy.result() == 0.05 and fut.result() == 0
+    if pool_cls is AioWorkerPool:
+        assert not pool._workers
+
+
+class Pool:  # stub, just enough for controller
+    def __init__(self, size, waiting=0):
+        self.size, self.n_active, self.waiting = size, size, waiting
+
+    def __len__(self):
+        return self.n_active + self.waiting
+
+    def resize(self, size):
+        self.size = size
+
+
+def test_aimd_decide():
+    ctl = AimdController(2, 10, interval=0, min_samples=1)
+
+    pool = Pool(8)
+    ctl.observe(pool, 0.1)  # sets baseline
+    assert pool.size == 8  # nobody waits
+
+    pool.waiting = 3
+    ctl.observe(pool, 0.1)
+    ctl.observe(pool, 0.1)
+    assert pool.size == 10  # additive increase up to max_size
+    ctl.observe(pool, 0.1)
+    assert pool.size == 10
+
+    ctl.observe(pool, 1)  # latency grows
+    assert pool.size == 7  # multiplicative decrease
+
+    ctl.observe(pool, 0.1, ValueError())
+    assert pool.size == 5
+    ctl.observe(pool, 0.1, aio.CancelledError())  # not an error
+    assert pool.size == 6
+
+    for _ in range(10):
+        ctl.observe(pool, 0.1, ValueError())
+    assert pool.size == 2  # min_size
+
+
+@pytest.mark.asyncio
+async def test_controller():
+    ctl = AimdController(1, 16, interval=0, min_samples=5,
+                         max_error_rate=0.5, latency_target=1)
+    overloaded = False
+
+    async def wrk(n):
+        await aio.sleep(0.001)
+        if overloaded:
+            raise RuntimeError('backend is down')
+        return n
+
+    async with AioPool(size=2, controller=ctl) as pool:
+        await pool.map(wrk, range(100))
+        assert pool.size > 2
+
+        overloaded = True
+        await pool.map(wrk, range(100))
+        assert pool.size == 1
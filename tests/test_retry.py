@@ -0,0 +1,91 @@
+import pytest
+import asyncio as aio
+from asyncio_pool import AioPool, AioWorkerPool, Retry, Metrics, getres
+
+
+class Flaky:
+    def __init__(self, fails=2, exc=ConnectionError):
+        self.fails, self.exc = fails, exc
+        self.calls = {}
+        self.active = self.max_active = 0
+
+    async def __call__(self, n):
+        self.active += 1
+        self.max_active = max(self.active, self.max_active)
+        try:
+            await aio.sleep(0.001)
+            self.calls[n] = self.calls.get(n, 0) + 1
+            if self.calls[n] <= self.fails:
+                raise self.exc(n)
+            return n
+        finally:
+            self.active -= 1
+
+
+def test_policy():
+    retry = Retry(3, on=(KeyError, ValueError), backoff=1, factor=2,
+                  max_backoff=3, jitter=False)
+    assert retry.retries(KeyError(), 1) and retry.retries(ValueError(), 2)
+    assert not retry.retries(KeyError(), 3)
+    assert not retry.retries(TypeError(), 1)
+    assert not retry.retries(aio.CancelledError(), 1)
+    assert [retry.delay(a) for a in (1, 2, 3)] == [1, 2, 3]
+
+    retry = Retry(on=lambda e: 'retry' in str(e), backoff=1)
+    assert retry.retries(ValueError('retry me'), 1)
+    assert not retry.retries(ValueError('no'), 1)
+    assert all(0 <= retry.delay(1) <= 1 for _ in range(100))
+
+    with pytest.raises(ValueError):
+        Retry(0)
+
+
+@pytest.mark.parametrize('pool_cls', [AioPool, AioWorkerPool])
+@pytest.mark.asyncio
+async def test_map_retry(pool_cls):
+    wrk = Flaky(fails=2)
+    metrics = Metrics()
+    async with pool_cls(size=3, metrics=metrics) as pool:
+        results = await pool.map(wrk, range(10),
+                                 retry=Retry(3, backoff=0.01))
+        assert results == list(range(10))
+        assert wrk.calls == {n: 3 for n in range(10)}
+        assert wrk.max_active <= 3
+
+        wrk = Flaky(fails=5)
+        futures = pool.map_n(wrk, range(5), retry=Retry(2, backoff=0))
+        await pool.join()
+        assert all(isinstance(getres.flat(f), ConnectionError)
+                   for f in futures)
+        assert wrk.calls == {n: 2 for n in range(5)}
+
+        wrk = Flaky(fails=1, exc=KeyError)
+        res = [r async for r in pool.itermap(wrk, range(5), ordered=True,
+                                             retry=Retry(on=ValueError))]
+        assert all(isinstance(r, KeyError) for r in res)  # not retried
+
+        with pytest.raises(ValueError):
+            await pool.map(wrk, range(5), chunksize=2, retry=Retry())
+
+    assert metrics.retries == 10 * 2 + 5
+
+
+@pytest.mark.parametrize('pool_cls', [AioPool, AioWorkerPool])
+@pytest.mark.asyncio
+async def test_backoff_frees_pool(pool_cls):
+    wrk = Flaky(fails=1)
+    async with pool_cls(size=1) as pool:
+        slow = await pool.spawn(lambda: wrk('slow'), retry=Retry(backoff=10))
+        await aio.sleep(0.01)
+        assert len(pool) == 1 and pool.n_active == 0  # backing off
+        assert await pool.exec(Flaky(fails=0)('fast')) == 'fast'
+
+        cancelled, results = await pool.cancel(slow)
+        assert cancelled == 1 and pool.is_empty
+
+        started = pool.loop.time()
+        fut = pool.spawn_n(lambda: wrk('timed'), retry=Retry(backoff=10),
+                           deadline=started + 0.05)
+        await pool.join()
+        assert pool.loop.time() - started < 0.1
+        assert isinstance(getres.flat(fut), aio.TimeoutError)
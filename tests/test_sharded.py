@@ -0,0 +1,63 @@
+import os
+import pytest
+import asyncio as aio
+from asyncio_pool import ShardedPool, getres
+
+
+async def square(n):
+    await aio.sleep(0.001)
+    assert n != 13, 'unlucky'
+    return n * n
+
+
+async def pid(n):
+    await aio.sleep(0.001)
+    return os.getpid()
+
+
+async def source(n):
+    for i in range(n):
+        await aio.sleep(0)
+        yield i
+
+
+@pytest.mark.asyncio
+async def test_sharded_map():
+    async with ShardedPool(2, size=8, batch=4) as pool:
+        res = await pool.map(square, range(100))
+        assert res[:13] == [i * i for i in range(13)]
+        assert isinstance(res[13], AssertionError)
+        assert res[14:] == [i * i for i in range(14, 100)]
+
+        pids = await pool.map(pid, range(40))
+        assert len(set(pids)) == 2 and os.getpid() not in pids
+
+        # same key -- same shard
+        pids = await pool.map(pid, range(40), key=lambda i: i % 2)
+        assert len(set(pids[::2])) == len(set(pids[1::2])) == 1
+        assert len(pool) == 0
+
+
+@pytest.mark.parametrize('ordered', [False, True])
+@pytest.mark.asyncio
+async def test_sharded_itermap(ordered):
+    async with ShardedPool(2, size=4, prefetch=2, batch=3) as pool:
+        res = []
+        async for r in pool.itermap(square, source(50), ordered=ordered,
+                                    get_result=getres.pair):
+            assert len(pool) <= 4 + 2
+            res.append(r)
+
+    expected = [(i * i, None) for i in range(50) if i != 13]
+    values = [r for r in res if r[1] is None]
+    assert values == expected if ordered else sorted(values) == expected
+    assert len(res) == 50
+
+
+@pytest.mark.asyncio
+async def test_sharded_errors():
+    async with ShardedPool(1, size=2) as pool:
+        res = await pool.map(lambda i: square(i), [1, 2])  # not picklable
+        assert all(isinstance(r, Exception) for r in res)
+        res = await pool.map(square, [2, 'x'])
+        assert res[0] == 4 and isinstance(res[1], TypeError)
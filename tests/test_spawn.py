@@ -1,6 +1,6 @@
 import pytest
 import asyncio as aio
-from asyncio_pool import AioPool
+from asyncio_pool import AioPool, AioWorkerPool
 
 
 @pytest.mark.asyncio
@@ -69,3 +69,37 @@ async def test_spawn_and_exec():
     ix = order.index(marker)
     iy = order.index(marker, ix+1)
     assert iy - ix > 1
+
+
+@pytest.mark.asyncio
+async def test_cancel_not_started():
+    async def wrk(n):
+        await aio.sleep(0.1)
+        return n
+
+    async with AioPool(size=2) as pool:
+        futures = [pool.spawn_n(wrk(i)) for i in range(4)]
+        assert pool.n_active == 2  # tasks are created, but did not start
+        cancelled, results = await pool.cancel()
+        assert cancelled == 4 and pool.is_empty
+    assert all(isinstance(r, aio.CancelledError) for r in results)
+
+
+@pytest.mark.parametrize('pool_cls', [AioPool, AioWorkerPool])
+@pytest.mark.asyncio
+async def test_priority(pool_cls):
+    order = []
+
+    async def wrk(n):
+        order.append(n)
+        await aio.sleep(0)
+
+    async with pool_cls(size=1) as pool:
+        blocker = pool.spawn_n(aio.sleep(0.01))
+        for n, priority in [(1, 0), (2, -1), (3, 5), (4, 0), (5, 5), (6, 1)]:
+            pool.spawn_n(wrk(n), priority=priority)
+        await pool.spawn(wrk(7), priority=10)  # jumps the queue
+        pool.map_n(wrk, [8, 9], priority=2)
+
+    assert blocker.done()
+    assert order == [7, 3, 5, 8, 9, 6, 1, 4, 2]
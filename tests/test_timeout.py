@@ -0,0 +1,68 @@
+import pytest
+import asyncio as aio
+from asyncio_pool import AioPool, AioWorkerPool, getres
+
+
+async def wrk(n):
+    await aio.sleep(n)
+    return n
+
+
+async def cb(res, err):
+    await aio.sleep(0)
+    return err[0] if err else res
+
+
+@pytest.mark.parametrize('pool_cls', [AioPool, AioWorkerPool])
+@pytest.mark.asyncio
+async def test_spawn_timeout(pool_cls):
+    async with pool_cls(size=2) as pool:
+        started = pool.loop.time()
+        hung = await pool.spawn(wrk(100), timeout=0.05)
+        fast = await pool.spawn(wrk(0.01), timeout=0.05)
+        with_cb = await pool.spawn(wrk(100), cb, timeout=0.05)  # waits
+
+        with pytest.raises(aio.TimeoutError):
+            await pool.exec(wrk(100), timeout=0.02)
+
+    assert pool.loop.time() - started < 0.2  # slots were released
+    assert isinstance(getres.flat(hung), aio.TimeoutError)
+    assert fast.result() == 0.01
+    assert isinstance(with_cb.result(), aio.TimeoutError)
+    assert not pool._deadlines and not pool._timers and pool._timer is None
+
+
+@pytest.mark.parametrize('pool_cls', [AioPool, AioWorkerPool])
+@pytest.mark.asyncio
+async def test_deadline(pool_cls):
+    async with pool_cls(size=2) as pool:
+        deadline = pool.loop.time() + 0.05
+        futures = pool.map_n(wrk, [0.01, 100, 0.01, 0.03, 0.01],
+                             deadline=deadline)
+        await pool.join()
+        assert pool.loop.time() - deadline < 0.05
+
+    results = [getres.flat(f) for f in futures]
+    assert results[0] == results[2] == 0.01
+    assert isinstance(results[1], aio.TimeoutError)  # was active
+    assert isinstance(results[4], aio.TimeoutError)  # was waiting
+
+
+@pytest.mark.parametrize('pool_cls', [AioPool, AioWorkerPool])
+@pytest.mark.asyncio
+async def test_map_task_timeout(pool_cls):
+    todo = [0.01, 100] * 5
+    async with pool_cls(size=4) as pool:
+        results = await pool.map(wrk, todo, cb, task_timeout=0.05)
+        assert results[::2] == todo[::2]
+        assert all(isinstance(r, aio.TimeoutError) for r in results[1::2])
+
+        res = [r async for r in pool.itermap(wrk, todo, task_timeout=0.05,
+                                             ordered=True)]
+        assert res[::2] == todo[::2]
+        assert all(isinstance(r, aio.TimeoutError) for r in res[1::2])
+
+        # chunk is the one who is timed out
+        res = await pool.map(wrk, todo[:4], chunksize=2, task_timeout=0.05)
+        assert res[0] == res[2] == 0.01
+        assert all(isinstance(r, aio.TimeoutError) for r in res[1::2])
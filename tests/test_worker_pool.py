@@ -0,0 +1,139 @@
+import pytest
+import asyncio as aio
+from asyncio_pool import AioPool, AioWorkerPool, getres
+
+
+async def wrk(n):
+    await aio.sleep(1 / n)
+    return n
+
+
+async def cb(res, err, ctx):
+    if err:
+        exc, tb = err
+        assert tb
+        return exc
+    await aio.sleep(0)
+    return res * 2
+
+
+@pytest.mark.asyncio
+async def test_concurrency():
+    todo = range(1, 21)
+    active, max_active = 0, 0
+
+    async def wrk(n):
+        nonlocal active, max_active
+        active += 1
+        max_active = max(active, max_active)
+        await aio.sleep(1 / n)
+        active -= 1
+        return n
+
+    async with AioWorkerPool(size=5) as pool:
+        futures = pool.map_n(wrk, todo)
+        await aio.sleep(0.01)
+        assert pool.n_active == 5 and pool.is_full
+        assert len(pool) == len(todo)
+
+    assert max_active == 5
+    assert sum(todo) == sum(f.result() for f in futures)
+    await aio.sleep(0)  # let workers exit
+    assert pool.is_empty and not pool._workers
+
+
+@pytest.mark.asyncio
+async def test_no_tasks_per_coroutine():
+    todo = range(1, 101)
+
+    async def count_tasks(pool_cls):
+        loop = aio.get_event_loop()
+        created = 0
+        factory = loop.get_task_factory()
+
+        def counting_factory(loop, coro, **kw):
+            nonlocal created
+            created += 1
+            return aio.Task(coro, loop=loop, **kw)
+
+        loop.set_task_factory(counting_factory)
+        try:
+            async with pool_cls(size=10) as pool:
+                results = await pool.map(wrk, todo, cb)
+        finally:
+            loop.set_task_factory(factory)
+        assert 2 * sum(todo) == sum(results)
+        return created
+
+    assert await count_tasks(AioWorkerPool) == 10
+    assert await count_tasks(AioPool) == 2 * len(todo)  # coros and callbacks
+
+
+@pytest.mark.asyncio
+async def test_spawn_and_exec():
+    async with AioWorkerPool(size=2) as pool:
+        f1 = await pool.spawn(wrk(10))
+        f2 = await pool.spawn(wrk(10))
+        assert pool.n_active == 2
+        assert 10 == await pool.exec(wrk(10))
+        assert 20 == await pool.exec(wrk(10), cb)
+        with pytest.raises(ZeroDivisionError):
+            await pool.exec(wrk(0))
+    assert f1.result() == f2.result() == 10
+    assert pool._executed == 6
+
+
+@pytest.mark.asyncio
+async def test_cancel():
+
+    async def wrk_slow(*arg, **kw):
+        await aio.sleep(0.5)
+        return 1
+
+    async def wrk_safe(*arg, **kw):
+        try:
+            await aio.sleep(0.5)
+        except aio.CancelledError:
+            await aio.sleep(0.1)  # simulate cleanup
+        return 1
+
+    pool = AioWorkerPool(size=5)
+
+    f_quick = pool.spawn_n(aio.sleep(0.15))
+    f_safe = await pool.spawn(wrk_safe())
+    f3 = await pool.spawn(wrk_slow())
+    pool.spawn_n(wrk_slow())
+    f567 = pool.map_n(wrk_slow, range(3))
+
+    await aio.sleep(0.1)
+    cancelled, results = await pool.cancel(f3, f567[2])  # running and waiting
+    assert cancelled == len(results) == 2
+    assert all(isinstance(res, aio.CancelledError) for res in results)
+
+    await aio.sleep(0.1)
+    assert f_quick.done() and f_quick.result() is None
+
+    cancelled, results = await pool.cancel()  # all
+    assert cancelled == len(results) == 4
+    assert f_safe.done() and f_safe.result() == 1
+    assert sum(isinstance(res, aio.CancelledError) for res in results) == 3
+
+    assert await pool.join()
+
+    # workers survive cancellations of coroutines they execute
+    assert 10 == await pool.exec(wrk(10))
+
+
+@pytest.mark.asyncio
+async def test_itermap():
+    todo = range(2, 11)
+    res = 0
+    async with AioWorkerPool(size=3) as pool:
+        async for i in pool.itermap(wrk, todo, cb, lazy=True,
+                yield_when=aio.FIRST_COMPLETED):
+            res += i
+    assert 2 * sum(todo) == res
+
+    async with AioWorkerPool(size=3) as pool:
+        results = await pool.map(wrk, range(3), get_result=getres.pair)
+    assert isinstance(results[0][1], ZeroDivisionError)